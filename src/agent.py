@@ -1,98 +1,1266 @@
-from utils import extract_action_and_action_input
-from prompts import chat_history
-from tools import tools_str
-from tools import (
-    calculator_add, 
-    calculator_divide, 
-    calculator_multiply, 
-    calculator_subtract, 
-    llm_knowledge,
-    internet_search)
-
-from dotenv import load_dotenv
-from tavily import TavilyClient
-from openai import OpenAI
+from utils import ACTION_LINE, extract_actions, parse_action_input, StreamingActionParser
+from prompts import build_chat_history, user_prompt
+from clients import build_http_client, AsyncTavilySearch
+from history import count_message_tokens
+from tracing import NULL_SPAN, log
+from resilience import RetryPolicy, call_with_retry, get_breaker
+from sessions import SessionHistory, new_session_id
+from budget import BudgetExhausted, RunBudget
+from cache import make_cache_key
+from tools import registry
+
+from types import SimpleNamespace
+import hashlib
+import copy
+import asyncio
+import json
+import time
 import os
+import re
+
 
-load_dotenv()
+# Completion tokens reserved per LLM call when throttling, corrected once usage is known
+COMPLETION_TOKENS_ESTIMATE = 500
 
+# Halt generation at "Observation" so the LLM doesn’t hallucinate results. We’ll run the tools and inject their actual output.
+STOP_SEQUENCES = ["Observation:", "Observation 1:"]
 
-# Initialize OpenAI client with API Key
-client = OpenAI(
-    api_key=os.getenv("OPENAI_API_KEY")
+# Last turn of a run whose budget ran out
+FINALIZE_PROMPT = (
+    "You have run out of budget for this question and cannot take any more actions. "
+    "Using only the observations so far, give your best answer now as 'Final Answer: ...'. "
+    "If the information is incomplete, say what is missing."
 )
 
-# Initialize Tavily (internet search) client with API Key 
-tavily_client = TavilyClient(os.getenv("TAVILY_API_KEY"))
-
-# ---------------------  Main ReAct loop  ---------------------
-iterations = 1
-while True:
-
-    completion = client.chat.completions.create(
-        model="gpt-4o",
-        temperature=0.2,
-        messages=chat_history,
-        stop=["Observation:"] # Halt generation at "Observation:" so the LLM doesn’t hallucinate results. We’ll run the tool and inject its actual output.
-    )
-
-    response_text = completion.choices[0].message.content
-    print("-" * 80)
-    print(f"ReAct Loop #{iterations}\n")
-    print(response_text)
-
-    action, action_input = extract_action_and_action_input(response_text)
-
-    # Check if the model proposed an action
-    if action:
-        print(f"\n-- Taking the action of '{action}' --")
-
-        # Dispatch to tool implementations
-        if action == "calculator_add":
-            a, b = action_input
-            action_result = calculator_add(a, b)
-        elif action == "calculator_subtract":
-            a, b = action_input
-            action_result = calculator_subtract(a, b)
-        elif action == "calculator_multiply":
-            a, b = action_input
-            action_result = calculator_multiply(a, b)
-        elif action == "calculator_divide":
-            a, b = action_input
-            action_result = calculator_divide(a, b)
-        elif action == "llm_knowledge":
-            action_result = llm_knowledge(client, action_input)
-        elif action == "internet_search":
-            action_result = internet_search(tavily_client, action_input)
-        
-        print(f"\nObservation:", action_result)
-
-        # Feed observation back into chat history
-        result = [
-            {"role": "assistant", "content": response_text},
-            {"role": "user", "content": f"Observation: {action_result}"}
-        ]
-        chat_history.extend(result)
-
-        print("-" * 80, "\n")
-        iterations += 1
-    else:
+
+def new_usage_stats():
+    """
+    Return zeroed token usage counters for a run (or for the agent lifetime).
+    """
+
+    return {"llm_calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "cached_tokens": 0}
+
+
+def new_run_stats():
+    """
+    Counters and timings of one session (see 'Agent.run()').
+    """
+
+    return {"tokens_saved": 0, "reprompts": 0, "resumes": 0, **new_usage_stats(),
+            "llm_time_s": 0.0, "parse_time_s": 0.0, "tool_time_s": {}, "wall_time_s": 0.0,
+            "model_calls": []}
+
+
+def cache_hit_rate(stats):
+    """
+    Share of prompt tokens served from the provider's prompt cache.
+    """
+
+    return stats["cached_tokens"] / stats["prompt_tokens"] if stats["prompt_tokens"] else 0.0
+
+
+def prompt_digest(content):
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def snapshot_stats(stats):
+    """
+    Copy the counters of the run stats, to diff them at the end of an iteration.
+    """
+
+    return {**stats, "tool_time_s": dict(stats["tool_time_s"])}
+
+
+def iteration_metrics(before, after):
+    """
+    Per-iteration span attributes: what the run stats gained during one iteration.
+    """
+
+    return {
+        "llm_latency_s": after["llm_time_s"] - before["llm_time_s"],
+        "prompt_tokens": after["prompt_tokens"] - before["prompt_tokens"],
+        "completion_tokens": after["completion_tokens"] - before["completion_tokens"],
+        "cached_tokens": after["cached_tokens"] - before["cached_tokens"],
+        "parse_time_s": after["parse_time_s"] - before["parse_time_s"],
+        "tool_time_s": {
+            tool: seconds - before["tool_time_s"].get(tool, 0.0)
+            for tool, seconds in after["tool_time_s"].items()
+            if seconds != before["tool_time_s"].get(tool, 0.0)
+        }
+    }
+
+
+def format_observations(results):
+    """
+    Render tool results as the Observation message fed back to the model.
+
+    A single result keeps the classic 'Observation: ...' form. Several results
+    from one turn are numbered in action order ('Observation 1: ...', ...).
+    """
+
+    if len(results) == 1:
+        return f"Observation: {results[0]}"
+    return "\n\n".join(f"Observation {i}: {r}" for i, r in enumerate(results, start=1))
+
+
+def step_events(iteration, messages):
+    """
+    Describe the messages one iteration added to the history as step events.
+
+    Each assistant turn gives a "thought" (its text before the first action) and an
+    "action" per Action / tool call, each tool result an "observation", and a
+    format-error prompt a "reprompt". Event payloads are plain JSON-ready dicts.
+
+    Args:
+        iteration (int): The iteration the messages belong to.
+        messages (list[dict]): The new chat history messages, in order.
+
+    Returns:
+        list[dict]: The events, each with "event" and "iteration" keys.
+    """
+
+    events, acted = [], False
+    for message in messages:
+        content = message.get("content") or ""
+        if message["role"] == "assistant":
+            thought = re.split(r"^\s*(?:Action|Final Answer):", content, maxsplit=1, flags=re.MULTILINE)[0]
+            thought = thought.strip().removeprefix("Thought:").strip()
+            if thought:
+                events.append({"event": "thought", "iteration": iteration, "text": thought})
+            actions = [(call["function"]["name"], call["function"]["arguments"]) for call in message.get("tool_calls") or ()]
+            if not actions:
+                pending = None
+                for kind, value in ACTION_LINE.findall(content):
+                    if kind == "Action":
+                        pending = value
+                    elif pending is not None:
+                        actions.append((pending, value))
+                        pending = None
+            for action, action_input in actions:
+                events.append({"event": "action", "iteration": iteration, "action": action, "input": action_input})
+            acted = bool(actions)
+        elif message["role"] == "tool" or acted:
+            events.append({"event": "observation", "iteration": iteration, "text": content})
+        else:
+            events.append({"event": "reprompt", "iteration": iteration, "text": content})
+    return events
+
+
+class UsageRecordingClient:
+    """
+    The OpenAI client as handed to "llm" tools: 'chat.completions.create' is forwarded
+    and the usage of each completion is passed to 'on_usage', so tool calls count
+    towards the run stats, token budgets and rate limiter like the agent's own turns.
+    Every other attribute is the wrapped client's.
+    """
+
+    def __init__(self, client, on_usage):
+        self._client = client
+        self._on_usage = on_usage
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+    async def _create(self, **kwargs):
+        completion = await self._client.chat.completions.create(**kwargs)
+        self._on_usage(getattr(completion, "usage", None))
+        return completion
+
+
+class Agent:
+    """
+    Async ReAct agent.
+
+    Every call to 'run()' is an independent session with its own chat history,
+    so many questions can be answered concurrently on one event loop. All
+    sessions share one pooled HTTP client for the LLM and search backends.
+    """
+
+    def __init__(self,
+                 client=None,
+                 search_client=None,
+                 model="gpt-4o",
+                 stream=True,
+                 verbose=True,
+                 max_connections=100,
+                 search_cache=None,
+                 history=None,
+                 action_mode="text",
+                 rate_limiter=None,
+                 tracer=None,
+                 llm_retry=None,
+                 search_retry=None,
+                 sessions=None,
+                 passage_ranker=None,
+                 answer_cache=None,
+                 router=None,
+                 budget=None):
+        """
+        Args:
+            client: An 'AsyncOpenAI' client. Built from OPENAI_API_KEY if omitted.
+            search_client: An async search client with a Tavily-style 'search()'.
+                Built from TAVILY_API_KEY if omitted.
+            model (str): The model driving the ReAct loop.
+            stream (bool): Stream each turn and dispatch the tool as soon as a complete
+                Action / Action Input pair arrives, instead of waiting for the full response.
+            verbose (bool): Print each turn, action and observation.
+            max_connections (int): Size of the shared connection pool.
+            search_cache (SearchCache | None): Cache for 'internet_search' results, shared
+                by every session of this agent.
+            history (HistoryManager | None): Compacts the prompt sent on each iteration to
+                a token budget. None sends the full chat history every time.
+            action_mode (str): "text" parses Action / Action Input lines from the response.
+                "tools" sends OpenAI function schemas and takes actions as structured tool
+                calls (not streamed), falling back to the text format when the model
+                answers in plain text.
+            rate_limiter (RateLimiter | None): Requests/tokens-per-minute limits applied to
+                every LLM call of every session.
+            tracer (Tracer | None): Emits a span per run and per iteration (LLM latency,
+                time to first token, tokens, parse and tool time, observation size).
+            llm_retry (RetryPolicy | None): Retries for every LLM call (loop turns and
+                'llm_knowledge'). Defaults to 4 attempts with a 120 s per-attempt timeout.
+            search_retry (RetryPolicy | None): Retries for 'internet_search'. Defaults to 3
+                attempts with a 20 s per-attempt timeout and a hedged request after 3 s.
+            sessions (SessionLog | None): Checkpoints every session (each assistant turn,
+                observation and per-iteration stats) so 'resume()' can continue it after
+                a crash. None keeps sessions in memory only.
+            passage_ranker (PassageRanker | None): Fetch the full page text of search
+                results and keep only the passages most relevant to the query (BM25,
+                within a token budget). None uses the short per-result snippets.
+            answer_cache (AnswerCache | None): Answers repeated and paraphrased questions
+                from earlier final answers without running the loop, and stores every
+                new final answer.
+            router (ModelRouter | None): Picks the model of every ReAct turn and
+                'llm_knowledge' call from rules and measured latency and success rates.
+                None uses 'model' for every turn and gpt-4o for 'llm_knowledge'.
+            budget (RunBudget | None): Default iteration, token and wall-clock limits of
+                every run. Defaults to 25 iterations with no token or time limit.
+        """
+
+        # Clients (and the SDK imports behind them) are built on first use, so importing
+        # this module and runs that never search stay cheap
+        self._client = client
+        self._search_client = search_client
+        self._http_client = None
+        self.max_connections = max_connections
+
+        self.model = model
+        self.stream = stream
+        self.verbose = verbose
+        self.search_cache = search_cache
+        self.history = history
+        self.action_mode = action_mode
+        self.rate_limiter = rate_limiter
+        self.tracer = tracer
+        self.sessions = sessions
+        self.passage_ranker = passage_ranker
+        self.answer_cache = answer_cache
+        self.router = router
+        self.budget = budget or RunBudget()
+
+        # Transient failures are retried with backoff; the breakers are shared process-wide
+        self.llm_retry = llm_retry or RetryPolicy(max_attempts=4, attempt_timeout=120.0)
+        self.search_retry = search_retry or RetryPolicy(max_attempts=3, attempt_timeout=20.0, hedge_after=3.0)
+        self.llm_breaker = get_breaker("openai")
+        self.search_breaker = get_breaker("tavily")
+
+        # Token usage summed over every run of this agent
+        self.totals = new_usage_stats()
+
+        # Tool name -> compiled handler, filled in on first use of each tool
+        self._handlers = {}
+
+    @property
+    def http_client(self):
+        """
+        The shared, pooled HTTP client (created on first use).
+        """
+
+        if self._http_client is None:
+            self._http_client = build_http_client(max_connections=self.max_connections)
+        return self._http_client
+
+    @property
+    def client(self):
+        """
+        The 'AsyncOpenAI' client. Built from OPENAI_API_KEY on first use if none was given.
+        """
+
+        if self._client is None:
+            from openai import AsyncOpenAI
+
+            self._client = AsyncOpenAI(
+                api_key=os.getenv("OPENAI_API_KEY"),
+                http_client=self.http_client,
+                max_retries=0  # Retries are handled by 'call_with_retry'
+            )
+        return self._client
+
+    @property
+    def search_client(self):
+        """
+        The async Tavily search client. Built from TAVILY_API_KEY on first use if none was given.
+        """
+
+        if self._search_client is None:
+            self._search_client = AsyncTavilySearch(
+                os.getenv("TAVILY_API_KEY"),
+                http_client=self.http_client
+            )
+        return self._search_client
+
+    def build_clients(self):
+        """
+        Create the OpenAI and search clients now instead of on first use, e.g. before
+        serving requests, so the first session does not pay for the SDK imports.
+
+        Returns:
+            tuple: The OpenAI client and the search client.
+        """
+
+        return self.client, self.search_client
+
+    async def aclose(self):
+        """
+        Release the shared connection pool (only if this agent created it).
+        """
+
+        if self._http_client is not None:
+            await self._http_client.aclose()
+
+    def _log(self, *args, **kwargs):
+        if self.verbose:
+            log(*args, **kwargs)
+
+    def _start_span(self, name, parent=None, **attributes):
+        if self.tracer is None:
+            return NULL_SPAN
+        return self.tracer.start_span(name, parent=parent, **attributes)
+
+    def _rate_limit(self, messages):
+        """
+        Estimate the token cost of an LLM call and build the rate-limiter wait that
+        'call_with_retry' runs before each of its attempts.
+
+        Returns:
+            tuple[int, Callable[[], Awaitable] | None]: The estimated token cost, and the
+                wait (None without a rate limiter).
+        """
+
+        estimate = count_message_tokens(messages) + COMPLETION_TOKENS_ESTIMATE
+        if self.rate_limiter is None:
+            return estimate, None
+        return estimate, lambda: self.rate_limiter.acquire(estimate)
+
+    def _record_usage(self, stats, usage, estimate=None):
+        """
+        Add a completion's token usage (including 'cached_tokens') to the run stats
+        and to the agent totals, and settle the rate limiter's estimate.
+        """
+
+        if usage is None:
+            return
+
+        if self.rate_limiter is not None and estimate is not None:
+            self.rate_limiter.settle(estimate, (usage.prompt_tokens or 0) + (usage.completion_tokens or 0))
+
+        details = getattr(usage, "prompt_tokens_details", None)
+        cached = (getattr(details, "cached_tokens", None) or 0) if details else 0
+        for counters in (stats, self.totals):
+            if counters is None:
+                continue  # A tool dispatched outside a run
+            counters["llm_calls"] += 1
+            counters["prompt_tokens"] += usage.prompt_tokens or 0
+            counters["completion_tokens"] += usage.completion_tokens or 0
+            counters["cached_tokens"] += cached
+
+    async def _create_completion(self, stats, **kwargs):
+        """
+        Create a chat completion through the shared retry policy and circuit breaker,
+        and record its token usage.
+
+        Every request waits for the rate limiter, retries and hedged duplicates
+        included, since the provider counts each one.
+        """
+
+        estimate, acquire = self._rate_limit(kwargs["messages"])
+        completion = await call_with_retry(
+            lambda: self._timed(kwargs["model"], self.client.chat.completions.create(**kwargs)),
+            self.llm_retry,
+            self.llm_breaker,
+            acquire
+        )
+        self._record_usage(stats, completion.usage, estimate)
+        return completion
+
+    async def _timed(self, model, call):
+        """
+        Await one LLM call and report its latency and outcome to the router.
+
+        A cancelled call (deadline, client disconnect, losing hedge) is not reported:
+        it says nothing about the model.
+        """
+
+        if self.router is None:
+            return await call
+        started = time.perf_counter()
+        try:
+            result = await call
+        except Exception:
+            self.router.record(model, None, ok=False)
+            raise
+        self.router.record(model, time.perf_counter() - started, ok=True)
+        return result
+
+    def _choose_model(self, kind, stats, iteration=None):
+        """
+        Pick the model of one LLM call and record the choice in the run stats.
+        """
+
+        if self.router is not None:
+            model = self.router.choose(kind, iteration, stats["reprompts"] if stats else 0)
+        else:
+            model = self.model if kind == "planner" else "gpt-4o"
+        if stats is not None:
+            stats["model_calls"].append({"call": kind, "iteration": iteration, "model": model})
+        return model
+
+    async def _complete_turn(self, messages, stats, model):
+        """
+        Request one ReAct turn from the model without streaming.
+        """
+
+        completion = await self._create_completion(
+            stats,
+            model=model,
+            temperature=0.2,
+            messages=messages,
+            stop=STOP_SEQUENCES
+        )
+
+        response_text = completion.choices[0].message.content
+        self._log(response_text)
+        return response_text
+
+    async def _stream_turn(self, messages, stats, model, span=NULL_SPAN):
+        """
+        Stream one ReAct turn and start each tool as soon as its action is complete.
+
+        Tokens are echoed as they arrive and fed into a 'StreamingActionParser'. Each
+        complete Action / Action Input pair is dispatched immediately, overlapping the
+        tool with the rest of the generation. Once the model moves past its actions,
+        the rest of the stream is cancelled. A 'Final Answer:' is surfaced the moment
+        it appears and streamed through to the end.
+
+        The whole turn, reading included, is one attempt of the LLM retry policy: a
+        connection error or timeout mid-stream cancels the tools the attempt started,
+        drops its partial text and requests the turn again. Streamed turns are never
+        hedged, since a duplicate would start every tool twice.
+
+        Token usage arrives in the last chunk of the stream, so it is only recorded
+        for turns that are not cut short.
+
+        Args:
+            messages (list[dict]): The chat history to send to the model.
+            stats (dict): The run stats to record token usage and parse time in.
+            span (Span | NullSpan): The iteration span; gets the time to first token.
+
+        Returns:
+            tuple[str, list[asyncio.Task]]:
+                - The response text, cut right after the last Action Input line if
+                  actions were detected.
+                - The (action, arguments, task) of each tool already started, in action order.
+        """
+
+        requested = time.perf_counter()
+        policy = self.llm_retry
+        if policy.hedge_after is not None:
+            policy = copy.copy(policy)
+            policy.hedge_after = None
+
+        estimate, acquire = self._rate_limit(messages)
+
+        async def attempt():
+            parser = StreamingActionParser()
+            started = []
+            stream = await self.client.chat.completions.create(
+                model=model,
+                temperature=0.2,
+                messages=messages,
+                stop=STOP_SEQUENCES,
+                stream=True,
+                stream_options={"include_usage": True}
+            )
+
+            try:
+                async for chunk in stream:
+                    if not chunk.choices:
+                        self._record_usage(stats, chunk.usage, estimate)
+                        continue
+                    delta = chunk.choices[0].delta.content or ""
+                    if delta and not parser.text:
+                        span.set(ttft_s=time.perf_counter() - requested)
+                    previous_state = parser.state
+                    self._log(delta, end="", flush=True)
+
+                    parse_started = time.perf_counter()
+                    state = parser.feed(delta)
+
+                    # Start every newly completed action right away
+                    for action, raw_input in parser.actions[len(started):]:
+                        try:
+                            # An unknown tool is answered by 'dispatch', like in 'extract_actions'
+                            action_input = parse_action_input(action, raw_input) if action in registry else {}
+                        except Exception:
+                            break  # Left to 'extract_actions', which re-prompts the whole turn
+                        task = asyncio.create_task(self.dispatch(action, action_input, stats))
+                        started.append((action, action_input, task))
+                    stats["parse_time_s"] += time.perf_counter() - parse_started
+
+                    if state == "done":
+                        break  # All actions are in, no need to wait for the rest of the generation
+                    if state == "final_answer" and previous_state != "final_answer":
+                        self._log("\n-- Final answer detected, streaming it through. --\n", flush=True)
+            except BaseException as e:
+                # Nobody will await the tools this attempt started (a retry, or the run hit its deadline)
+                for _, _, task in started:
+                    task.cancel()
+                if isinstance(e, Exception):
+                    self._log(f"\n-- Stream failed: {type(e).__name__}: {e} --", flush=True)
+                raise
+            finally:
+                # Closing the stream cancels the remaining generation server-side
+                await stream.close()
+
+            parser.finish()
+            return parser.text, started
+
+        text, started = await call_with_retry(lambda: self._timed(model, attempt()), policy, self.llm_breaker, acquire)
+        self._log()
+        return text, started
+
+    async def _tool_call_turn(self, messages, stats, model):
+        """
+        Request one turn with native function calling.
+
+        Returns:
+            tuple[str, list]: The response text (may be empty) and the tool calls, if any.
+        """
+
+        completion = await self._create_completion(
+            stats,
+            model=model,
+            temperature=0.2,
+            messages=messages,
+            tools=registry.schemas,
+            parallel_tool_calls=True
+        )
+
+        message = completion.choices[0].message
+        response_text = message.content or ""
+        self._log(response_text)
+        return response_text, message.tool_calls or []
+
+    async def _run_tool_calls(self, message, stats):
+        """
+        Dispatch the native tool calls of an assistant message concurrently.
+
+        Calls with unknown names or invalid arguments are answered with an error message
+        (counted as a re-prompt) while the valid ones still run.
+
+        Returns:
+            list[dict]: One 'tool' message per call, in call order.
+        """
+
+        tool_calls = message["tool_calls"]
+        parsed = []
+        for call in tool_calls:
+            try:
+                arguments = json.loads(call["function"]["arguments"] or "{}")
+                parsed.append(registry.coerce(call["function"]["name"], arguments))
+            except Exception as e:
+                parsed.append(e)
+
+        valid = [(call["function"]["name"], action_input)
+                 for call, action_input in zip(tool_calls, parsed)
+                 if not isinstance(action_input, Exception)]
+        for action, _ in valid:
+            self._log(f"\n-- Taking the action of '{action}' --")
+        results = iter(await self.dispatch_all(valid, stats=stats))
+
+        observations = []
+        for call, action_input in zip(tool_calls, parsed):
+            name = call["function"]["name"]
+            if isinstance(action_input, Exception):
+                stats["reprompts"] += 1
+                content = (f"Invalid call to '{name}': {action_input}. "
+                           f"The tool must be one of {', '.join(registry.names)} with valid arguments.")
+            else:
+                content = str(next(results))
+            self._log(f"\nObservation ({name}):", content)
+            observations.append({"role": "tool", "tool_call_id": call["id"], "content": content})
+        return observations
+
+    async def dispatch(self, action, arguments, stats=None):
+        """
+        Run the tool named by 'action' with its keyword arguments and return its result.
+
+        An unknown action gets an error message as its result (counted as a re-prompt)
+        instead of failing the turn. If 'stats' is given, the time spent in the tool is
+        added to stats["tool_time_s"][action].
+        """
+
+        started = time.perf_counter()
+        try:
+            handler = self._handlers.get(action)
+            if handler is None:
+                if action not in registry:
+                    if stats is not None:
+                        stats["reprompts"] += 1
+                    return f"Unknown tool '{action}'. The tool must be one of {', '.join(registry.names)}."
+                handler = self._handlers[action] = self._compile(registry.get(action))
+            return await handler(arguments, stats)
+        finally:
+            if stats is not None:
+                tool_time = stats["tool_time_s"]
+                tool_time[action] = tool_time.get(action, 0.0) + time.perf_counter() - started
+
+    def _compile(self, tool):
+        """
+        Build the dispatch handler of a tool once: its backend resources, retry policy,
+        result cache and timeout are resolved here instead of on every call.
+
+        Returns:
+            Callable[[dict, dict | None], Awaitable]: Runs the tool with its keyword
+                arguments and the run stats.
+        """
+
+        func = tool.func
+        if tool.backend == "llm":
+            async def call(arguments, stats):
+                model = self._choose_model(tool.name, stats)
+                estimate, acquire = self._rate_limit(
+                    [{"role": "user", "content": " ".join(map(str, arguments.values()))}])
+                unsettled = [estimate]  # Settled by the first completion; later ones only add usage
+
+                def on_usage(usage):
+                    self._record_usage(stats, usage, unsettled.pop() if unsettled else None)
+
+                client = UsageRecordingClient(self.client, on_usage)
+                return await self._resilient_tool(
+                    tool.name,
+                    lambda: self._cached(tool, arguments, lambda: self._timed(
+                        model, func(client, model=model, **arguments))),
+                    self.llm_retry, self.llm_breaker, acquire)
+        elif tool.backend == "search":
+            async def call(arguments, stats):
+                return await self._resilient_tool(
+                    tool.name,
+                    lambda: self._cached(tool, arguments, lambda: func(
+                        self.search_client, cache=self.search_cache, ranker=self.passage_ranker, **arguments)),
+                    self.search_retry, self.search_breaker)
+        elif tool.is_async:
+            async def call(arguments, stats):
+                return await self._cached(tool, arguments, lambda: func(**arguments))
+        elif tool.timeout is not None:
+            # A sync tool can only be abandoned at its timeout from another thread
+            async def call(arguments, stats):
+                return await self._cached(tool, arguments, lambda: asyncio.to_thread(func, **arguments))
+        elif tool.cacheable:
+            async def invoke(arguments):
+                return func(**arguments)
+
+            async def call(arguments, stats):
+                return await self._cached(tool, arguments, lambda: invoke(arguments))
+        else:
+            async def call(arguments, stats):
+                return func(**arguments)
+
+        # A failing tool answers with its error, so the run keeps every iteration already paid for
+        def failed(e):
+            return f"The tool '{tool.name}' failed: {type(e).__name__}: {e}. Check the input or use another approach."
+
+        if tool.timeout is None:
+            async def guarded_call(arguments, stats):
+                try:
+                    return await call(arguments, stats)
+                except Exception as e:
+                    return failed(e)
+            return guarded_call
+
+        async def timed_call(arguments, stats):
+            try:
+                return await asyncio.wait_for(call(arguments, stats), tool.timeout)
+            except TimeoutError:
+                return f"The tool '{tool.name}' timed out after {tool.timeout:g} s. Try again with a simpler input or use another approach."
+            except Exception as e:
+                return failed(e)
+        return timed_call
+
+    async def _cached(self, tool, arguments, call):
+        """
+        Serve a cacheable tool from the agent's result cache ('search_cache'), keyed on
+        the tool name and its exact arguments. Failed calls are not cached.
+        """
+
+        if not tool.cacheable or self.search_cache is None:
+            return await call()
+        key = make_cache_key("", {"tool": tool.name, "arguments": arguments})
+        result = self.search_cache.get(key)
+        if result is None:
+            result = str(await call())
+            self.search_cache.set(key, result)
+        return result
+
+    async def _resilient_tool(self, action, call, policy, breaker, acquire=None):
+        """
+        Run a network-backed tool with retries. If it still fails, the error becomes the
+        observation, so the run keeps every iteration already paid for.
+        """
+
+        try:
+            return await call_with_retry(call, policy, breaker, acquire)
+        except Exception as e:
+            return f"The tool '{action}' failed: {type(e).__name__}: {e}. Try again later or use another approach."
+
+    async def dispatch_all(self, actions, started=(), stats=None):
+        """
+        Run every action of a turn concurrently and collect the results in order.
+
+        Args:
+            actions (list[tuple[str, dict]]): The (action, arguments) pairs of the turn.
+            started (Sequence[asyncio.Task]): Tasks already running for the first actions
+                (started while the turn was still streaming).
+            stats (dict | None): Run stats to record per-tool time in.
+
+        Returns:
+            list: One tool result per action, in action order.
+        """
+
+        pending = list(started)
+        for action, action_input in actions[len(pending):]:
+            pending.append(self.dispatch(action, action_input, stats))
+        return await asyncio.gather(*pending)
+
+    async def _step(self, chat_history, stats, span):
+        """
+        Run one ReAct iteration: request a turn, add it to the chat history and act on it.
+
+        Args:
+            chat_history (list[dict]): The full session history (appended to in place).
+            stats (dict): The run stats.
+            span (Span | NullSpan): The iteration span to annotate.
+
+        Returns:
+            str | None: The final response text once a final answer is given, else None.
+        """
+
+        # Send a compacted view when a history budget is set; 'chat_history' stays complete
+        messages = chat_history
+        if self.history is not None:
+            messages, saved = self.history.compact(chat_history)
+            stats["tokens_saved"] += saved
+
+        iteration = sum(1 for m in chat_history if m["role"] == "assistant") + 1
+        model = self._choose_model("planner", stats, iteration)
+        span.set(model=model)
+
+        started = []
+        turn_started = time.perf_counter()
+        if self.action_mode == "tools":
+            response_text, tool_calls = await self._tool_call_turn(messages, stats, model)
+            stats["llm_time_s"] += time.perf_counter() - turn_started
+            if tool_calls:
+                chat_history.append({
+                    "role": "assistant",
+                    "content": response_text or None,
+                    "tool_calls": [
+                        {"id": call.id, "type": "function",
+                         "function": {"name": call.function.name, "arguments": call.function.arguments}}
+                        for call in tool_calls
+                    ]
+                })
+                return await self._act(chat_history, stats, span)
+            # No tool calls: fall back to parsing the text format
+        elif self.stream:
+            response_text, started = await self._stream_turn(messages, stats, model, span)
+            stats["llm_time_s"] += time.perf_counter() - turn_started
+        else:
+            response_text = await self._complete_turn(messages, stats, model)
+            stats["llm_time_s"] += time.perf_counter() - turn_started
+            span.set(ttft_s=time.perf_counter() - turn_started)  # No streaming: first token = full response
+
+        chat_history.append({"role": "assistant", "content": response_text})
+        return await self._act(chat_history, stats, span, started)
+
+    async def _act(self, chat_history, stats, span, started=()):
+        """
+        Act on the assistant turn at the end of the chat history: dispatch its actions and
+        append the observations, stop on a final answer, or re-prompt after a format error.
+
+        Kept apart from '_step' so a resumed session can finish a turn recorded before a
+        crash without requesting it again.
+
+        Args:
+            chat_history (list[dict]): The full session history, ending with the assistant turn.
+            stats (dict): The run stats.
+            span (Span | NullSpan): The iteration span to annotate.
+            started (Sequence[tuple[str, dict, asyncio.Task]]): The (action, arguments, task)
+                of each tool already started while streaming.
+
+        Returns:
+            str | None: The final response text once a final answer is given, else None.
+        """
+
+        message = chat_history[-1]
+        if message.get("tool_calls"):
+            span.set(outcome="actions", actions=[call["function"]["name"] for call in message["tool_calls"]])
+            observations = await self._run_tool_calls(message, stats)
+            chat_history.extend(observations)
+            span.set(observation_chars=sum(len(m["content"]) for m in observations))
+            self._log("-" * 80, "\n")
+            return None
+
+        response_text = message["content"]
+        parse_started = time.perf_counter()
+        actions = extract_actions(response_text)
+        stats["parse_time_s"] += time.perf_counter() - parse_started
+
+        # Keep the streamed tools that are the leading actions of the parsed turn, cancel the rest
+        running = []
+        for i, (action, action_input, task) in enumerate(started):
+            if len(running) == i and i < len(actions) and actions[i] == (action, action_input):
+                running.append(task)
+            else:
+                task.cancel()
+
+        # Check if the model proposed any actions
+        if actions:
+            span.set(outcome="actions", actions=[action for action, _ in actions])
+            for action, _ in actions:
+                self._log(f"\n-- Taking the action of '{action}' --")
+
+            action_results = await self.dispatch_all(actions, running, stats)
+            observation = format_observations(action_results)
+            span.set(observation_chars=len(observation))
+
+            self._log(f"\n{observation}")
+
+            # Feed observations back into chat history
+            chat_history.append({"role": "user", "content": observation})
+
+            self._log("-" * 80, "\n")
+            return None
+
         # Check for final answer or re-prompt
         if "Final Answer:" in response_text:
-            print("\n-- Final answer detected. Stopping. --\n")
-            chat_history.append({"role": "assistant", "content": response_text})
-            break
-        else:
-            print("-- No valid action or action input detected. Re-prompting. --")
-            result = [
-                {"role": "assistant", "content": response_text},
-                {"role": "user", "content": (
-                    "You did not follow the required format. "
-                    "You must provide a valid Action and Action Input. "
-                    f"The action must be one of {tools_str}. "
-                    "Try again and follow the format carefully."
-                )}
-            ]
-            chat_history.extend(result)
+            span.set(outcome="final_answer")
+            self._log("\n-- Final answer detected. Stopping. --\n")
+            return response_text
+
+        span.set(outcome="reprompt")
+        self._log("-- No valid action or action input detected. Re-prompting. --")
+        stats["reprompts"] += 1
+
+        # A reply in the wrong format counts against the model that wrote it
+        planner_calls = [c for c in stats["model_calls"] if c["call"] == "planner"]
+        if self.router is not None and planner_calls:
+            self.router.reject(planner_calls[-1]["model"])
+        chat_history.append({"role": "user", "content": (
+            "You did not follow the required format. "
+            "You must provide a valid Action and Action Input. "
+            f"The action must be one of {registry.names}. "
+            "Try again and follow the format carefully."
+        )})
+        return None
+
+    async def run(self, question, session_id=None, budget=None, cancel_token=None, on_event=None):
+        """
+        Answer a single question with the ReAct loop.
+
+        Args:
+            question (str): The question to answer.
+            session_id (str | None): Id to checkpoint the session under when the agent
+                has a session log. A new id is generated if omitted; an existing one
+                raises ValueError (continue it with 'resume()' instead).
+            budget (RunBudget | None): Limits for this run instead of the agent's 'budget'.
+            cancel_token (CancelToken | None): Stops the run cooperatively when cancelled.
+            on_event (Callable[[dict], None] | None): Called with each step event (see
+                'step_events') as soon as its iteration completes, e.g. to stream progress.
+
+        Returns:
+            dict: The session outcome with keys:
+                - "question" (str): The input question.
+                - "answer" (str | None): The text after 'Final Answer:'. None when the run
+                  was stopped and no best-effort answer was requested or obtained.
+                - "iterations" (int): Number of ReAct loop iterations.
+                - "stopped" (str | None): Why the run stopped before the model gave a final
+                  answer on its own: "max_iterations", "max_tokens", "deadline" or "cancelled".
+                - "messages" (list[dict]): The full chat history of the session.
+                - "session_id" (str | None): The checkpointed session, if any.
+                - "cached" (dict | None): The answer cache entry the answer came from
+                  ("match" is "exact" or "similar"); the loop did not run.
+                - "stats" (dict): Run statistics: "tokens_saved" by history compaction,
+                  "reprompts" after format errors, "llm_calls", "prompt_tokens",
+                  "completion_tokens" and "cached_tokens" (prompt tokens served from the
+                  provider's prompt cache), "resumes" after a crash, plus timings in
+                  seconds: "wall_time_s", "llm_time_s" (waiting on the model),
+                  "parse_time_s" and "tool_time_s" (per tool name), and "model_calls"
+                  (the model picked for every planner turn and 'llm_knowledge' call).
+        """
+
+        if self.answer_cache is not None:
+            lookup_started = time.perf_counter()
+            cached = self.answer_cache.lookup(question)
+            if cached is not None:
+                self._log(f"-- Answer cache hit ({cached['match']}, similarity {cached['similarity']:.2f}) --")
+                stats = new_run_stats()
+                stats["wall_time_s"] = time.perf_counter() - lookup_started
+                self._start_span("react.run", model=self.model, answer_cache=cached["match"]).end()
+                return {"question": question, "answer": cached["answer"], "iterations": 0, "messages": [],
+                        "session_id": None, "cached": cached, "stopped": None, "stats": stats}
+
+        chat_history = build_chat_history(question, native_tools=self.action_mode == "tools")
+        if self.sessions is not None:
+            if session_id is not None and self.sessions.exists(session_id):
+                raise ValueError(f"Session '{session_id}' already exists; use resume() to continue it")
+            session_id = session_id or new_session_id()
+            self.sessions.append(session_id, {
+                "type": "start",
+                "question": question,
+                "model": self.model,
+                "action_mode": self.action_mode,
+                # The system prompt is the same for every session, so only its hash is stored
+                "system_sha256": prompt_digest(chat_history[0]["content"]),
+                "messages": chat_history[1:]
+            })
+            chat_history = SessionHistory(self.sessions, session_id, chat_history)
+
+        return await self._run_session(question, chat_history, new_run_stats(), session_id, budget, cancel_token,
+                                       on_event)
+
+    async def resume(self, session_id, budget=None, cancel_token=None, on_event=None):
+        """
+        Continue a checkpointed session from its last completed step.
+
+        Nothing already in the log is repeated: a turn the model had answered before
+        the crash is acted on without another LLM call, and only tools whose results
+        were not recorded are run. Resuming a finished session (including one answered
+        after its budget ran out) just returns its answer.
+
+        Args:
+            session_id (str): The session to resume.
+            budget (RunBudget | None): Limits for this run instead of the agent's 'budget'.
+                Iterations and tokens count the whole session, the deadline starts now.
+            cancel_token (CancelToken | None): Stops the run cooperatively when cancelled.
+            on_event (Callable[[dict], None] | None): Called with each step event of the
+                iterations run from now on.
+
+        Returns:
+            dict: The same outcome as 'run()'.
+
+        Raises:
+            KeyError: If there is no log for 'session_id'.
+            ValueError: If the agent has no session log, or the session was started with
+                another action mode or system prompt.
+        """
+
+        if self.sessions is None:
+            raise ValueError("resume() needs an Agent created with a session log ('sessions=...')")
+
+        records = self.sessions.read(session_id)
+        if not records or records[0]["type"] != "start":
+            raise ValueError(f"Session '{session_id}' has no start record")
+        start = records[0]
+        if start["action_mode"] != self.action_mode:
+            raise ValueError(f"Session '{session_id}' was run with action_mode='{start['action_mode']}'")
+
+        system = build_chat_history(start["question"], native_tools=self.action_mode == "tools")[0]
+        if prompt_digest(system["content"]) != start["system_sha256"]:
+            raise ValueError(f"Session '{session_id}' was started with a different system prompt")
+
+        messages, stats, stopped = [system, *start["messages"]], new_run_stats(), None
+        model_calls = []
+        for record in records[1:]:
+            if record["type"] == "messages":
+                messages.extend(record["messages"])
+            elif record["type"] == "step":
+                # Each step logs only its own model calls, so the log grows linearly
+                if "model_calls" in record["stats"]:
+                    model_calls = list(record["stats"]["model_calls"])  # Logged before that split
+                model_calls.extend(record.get("model_calls", ()))
+                stats = {**new_run_stats(), **record["stats"]}
+            elif record["type"] == "stopped":
+                stopped = record["reason"]
+        stats["model_calls"] = model_calls
+
+        # Already answered, by the model or by the best-effort turn after a stop: no LLM call
+        last = messages[-1]
+        content = last.get("content") or ""
+        if (last["role"] == "assistant" and not last.get("tool_calls") and "Final Answer:" in content
+                and (stopped is not None or not extract_actions(content))):
+            iterations = sum(1 for m in messages if m["role"] == "assistant") - (1 if stopped is not None else 0)
+            return {
+                "question": start["question"],
+                "answer": content.split("Final Answer:", 1)[1].strip(),
+                "iterations": iterations,
+                "messages": messages,
+                "session_id": session_id,
+                "cached": None,
+                "stopped": stopped,
+                "stats": stats
+            }
+
+        stats["resumes"] += 1
+
+        chat_history = SessionHistory(self.sessions, session_id, messages)
+        return await self._run_session(start["question"], chat_history, stats, session_id, budget, cancel_token,
+                                       on_event)
+
+    async def _bounded(self, step, deadline=None, cancel_token=None):
+        """
+        Await one iteration, cutting it short at the deadline or on cancellation.
+
+        The iteration runs as a task; stopping it cancels the LLM call or tool calls
+        it is waiting on.
+
+        Raises:
+            BudgetExhausted: With reason "deadline" or "cancelled".
+        """
+
+        if deadline is None and cancel_token is None:
+            return await step
+
+        task = asyncio.ensure_future(step)
+        waiters = {task}
+        if cancel_token is not None:
+            cancelled = asyncio.ensure_future(cancel_token.wait())
+            waiters.add(cancelled)
+        timeout = None if deadline is None else max(deadline - time.perf_counter(), 0.0)
+        try:
+            done, _ = await asyncio.wait(waiters, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+        except BaseException:
+            task.cancel()
+            raise
+        finally:
+            if cancel_token is not None:
+                cancelled.cancel()
+
+        if task in done:
+            return task.result()
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        raise BudgetExhausted("cancelled" if cancel_token is not None and cancel_token.cancelled else "deadline")
+
+    async def _finalize(self, chat_history, stats, reason, budget, cancel_token=None):
+        """
+        Ask for the best answer the run can give once its budget has run out.
+
+        One last turn without tools, bounded by 'budget.finalize_timeout_s'.
+
+        Returns:
+            str | None: The final response text, or None if finalizing is disabled, fails or
+                the model replies with another action instead of an answer.
+        """
+
+        if not budget.finalize or (reason == "cancelled" and not cancel_token.finalize):
+            return None
+        self._log(f"\n-- Stopped by {reason}. Asking for the best answer so far. --\n")
+
+        # Tool calls cut off mid-iteration still need a result for the history to be valid
+        message = chat_history[-1]
+        if message.get("tool_calls"):
+            chat_history.extend([{"role": "tool", "tool_call_id": call["id"], "content": f"Not run: stopped by {reason}."}
+                                 for call in message["tool_calls"]])
+        if message.get("content") != FINALIZE_PROMPT:  # Else a resumed session was stopped while finalizing
+            chat_history.append({"role": "user", "content": FINALIZE_PROMPT})
+
+        messages = chat_history
+        if self.history is not None:
+            messages, saved = self.history.compact(chat_history)
+            stats["tokens_saved"] += saved
+        iteration = sum(1 for m in chat_history if m["role"] == "assistant") + 1
+        model = self._choose_model("planner", stats, iteration)
+
+        async def final_turn():
+            options = {"tools": registry.schemas, "tool_choice": "none"} if self.action_mode == "tools" else {}
+            completion = await self._create_completion(
+                stats,
+                model=model,
+                temperature=0.2,
+                messages=messages,
+                stop=STOP_SEQUENCES,
+                **options
+            )
+            return completion.choices[0].message.content or ""
+
+        turn_started = time.perf_counter()
+        try:
+            response_text = await asyncio.wait_for(final_turn(), budget.finalize_timeout_s)
+        except Exception as e:
+            self._log(f"-- Could not get a final answer: {type(e).__name__}: {e} --")
+            return None
+        finally:
+            stats["llm_time_s"] += time.perf_counter() - turn_started
+
+        self._log(response_text)
+        if "Final Answer:" not in response_text:
+            # Text mode cannot forbid tools: another action, or nothing, is no answer
+            if not response_text.strip() or ACTION_LINE.search(response_text):
+                self._log("-- The model did not give a final answer. --")
+                return None
+            response_text = f"Final Answer: {response_text.strip()}"
+        chat_history.append({"role": "assistant", "content": response_text})
+        return response_text
+
+    async def _run_session(self, question, chat_history, stats, session_id=None, budget=None, cancel_token=None,
+                           on_event=None):
+        """
+        Drive the ReAct loop until a final answer, checkpointing after every iteration.
+
+        A history that ends with an assistant turn (a resumed session) starts by
+        acting on that turn instead of requesting a new one. The loop stops early when
+        the run budget is spent or 'cancel_token' is cancelled, then asks for the best
+        answer so far.
+        """
+
+        budget = budget or self.budget
+        run_started = time.perf_counter()
+        deadline = None if budget.deadline_s is None else run_started + budget.deadline_s
+        wall_time_before = stats["wall_time_s"]
+        run_span = self._start_span("react.run", model=self.model, action_mode=self.action_mode)
+
+        logged_calls = len(stats["model_calls"])  # Model calls already in the session log
+
+        # Each iteration adds exactly one assistant turn
+        iterations = sum(1 for m in chat_history if m["role"] == "assistant")
+        pending = chat_history[-1]["role"] == "assistant"
+        if not pending:
             iterations += 1
-            continue
\ No newline at end of file
+
+        # ---------------------  Main ReAct loop  ---------------------
+        final_text, stopped = None, None
+        try:
+            while True:
+                stopped = budget.exceeded(iterations, stats, time.perf_counter() - run_started)
+                if stopped is None and cancel_token is not None and cancel_token.cancelled:
+                    stopped = "cancelled"
+                if stopped is not None:
+                    if not pending:
+                        iterations -= 1  # This iteration never started
+                    break
+
+                self._log("-" * 80)
+                self._log(f"ReAct Loop #{iterations}\n")
+
+                span = self._start_span("react.iteration", parent=run_span, iteration=iterations)
+                before = snapshot_stats(stats) if span is not NULL_SPAN else None
+                mark = len(chat_history) - 1 if pending else len(chat_history)
+                try:
+                    if pending:
+                        pending = False
+                        step = self._act(chat_history, stats, span)
+                    else:
+                        step = self._step(chat_history, stats, span)
+                    final_text = await self._bounded(step, deadline, cancel_token)
+                except BudgetExhausted as e:
+                    stopped = e.reason
+                    span.set(outcome="stopped", stopped=stopped)
+                finally:
+                    if before is not None:
+                        span.set(**iteration_metrics(before, stats))
+                    span.end()
+
+                stats["wall_time_s"] = wall_time_before + time.perf_counter() - run_started
+                if session_id is not None:
+                    self.sessions.append(session_id, {
+                        "type": "step",
+                        "iteration": iterations,
+                        "stats": {k: v for k, v in stats.items() if k != "model_calls"},
+                        "model_calls": stats["model_calls"][logged_calls:]
+                    })
+                    logged_calls = len(stats["model_calls"])
+                    await self.sessions.sync()
+                if on_event is not None:
+                    for event in step_events(iterations, chat_history[mark:]):
+                        on_event(event)
+
+                if final_text is not None or stopped is not None:
+                    break
+                iterations += 1
+
+            if stopped is not None:
+                if session_id is not None:
+                    self.sessions.append(session_id, {"type": "stopped", "reason": stopped})
+                final_text = await self._finalize(chat_history, stats, stopped, budget, cancel_token)
+        finally:
+            stats["wall_time_s"] = wall_time_before + time.perf_counter() - run_started
+            run_span.set(iterations=iterations, stopped=stopped,
+                         **{k: v for k, v in stats.items() if k != "tool_time_s"})
+            run_span.end()
+            if session_id is not None:
+                await self.sessions.sync()
+                self.sessions.close_session(session_id)
+
+        answer = final_text.split("Final Answer:", 1)[1].strip() if final_text is not None else None
+        # Answers cut short by a budget are not reused for later questions
+        if self.answer_cache is not None and stopped is None:
+            self.answer_cache.store(question, answer, tools=stats["tool_time_s"], iterations=iterations)
+
+        return {
+            "question": question,
+            "answer": answer,
+            "iterations": iterations,
+            "messages": list(chat_history),
+            "session_id": session_id,
+            "cached": None,
+            "stopped": stopped,
+            "stats": stats
+        }
+
+    async def run_many(self, questions, concurrency=8):
+        """
+        Answer many questions concurrently, at most 'concurrency' at a time.
+
+        Args:
+            questions (Iterable[str]): The questions to answer.
+            concurrency (int): Maximum number of sessions in flight.
+
+        Returns:
+            list[dict]: One 'run()' result per question, in input order.
+        """
+
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def bounded_run(question):
+            async with semaphore:
+                return await self.run(question)
+
+        return await asyncio.gather(*(bounded_run(q) for q in questions))
+
+
+async def main():
+    from dotenv import load_dotenv
+    from cache import SearchCache
+    from history import HistoryManager
+
+    load_dotenv()
+
+    search_cache = SearchCache(path="search_cache.sqlite3")
+    agent = Agent(search_cache=search_cache, history=HistoryManager(token_budget=6000, keep_last_turns=3))
+    try:
+        result = await agent.run(user_prompt)
+        stats = result["stats"]
+        print(f"Prompt tokens: {stats['prompt_tokens']} "
+              f"(cached: {stats['cached_tokens']}, hit rate: {cache_hit_rate(stats):.0%})")
+    finally:
+        await agent.aclose()
+        search_cache.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,226 @@
+from agent import Agent
+from budget import RunBudget
+from cache import AnswerCache, SearchCache
+from sessions import SessionLog
+from ranking import PassageRanker
+from routing import ModelRouter
+from history import HistoryManager
+from ratelimit import RateLimiter
+from tracing import Tracer, JsonlExporter, OtlpHttpExporter, set_console_output
+
+from dotenv import load_dotenv
+import argparse
+import asyncio
+import hashlib
+import json
+import time
+import os
+
+
+def read_questions(path, id_field="id", question_field="question"):
+    """
+    Read questions from a JSONL file.
+
+    Each line is a JSON object holding the question text under 'question_field'
+    and an optional identifier under 'id_field' (the 1-based line number is used
+    when it is missing). Blank lines are skipped.
+
+    Args:
+        path (str): The input JSONL file.
+        id_field (str): Field holding the question identifier.
+        question_field (str): Field holding the question text.
+
+    Returns:
+        list[tuple[str, str]]: (id, question) pairs in file order.
+    """
+
+    questions = []
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            questions.append((str(record.get(id_field, line_number)), record[question_field]))
+    return questions
+
+
+def read_completed_ids(path):
+    """
+    Collect the ids already answered in an output file, so a batch can resume.
+
+    Records that ended in an error, and a trailing partial line left by a crash,
+    are not counted as completed and will be retried.
+
+    Args:
+        path (str): The output JSONL file (may not exist yet).
+
+    Returns:
+        set[str]: The ids of successfully answered questions.
+    """
+
+    completed = set()
+    if not os.path.exists(path):
+        return completed
+
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if not record.get("error"):
+                completed.add(record["id"])
+    return completed
+
+
+def session_id_for(question_id):
+    """
+    Stable session id for a question, so a re-run batch resumes its checkpointed session.
+    """
+
+    return hashlib.sha256(question_id.encode("utf-8")).hexdigest()[:32]
+
+
+async def answer(agent, question_id, question):
+    # With a session log, a question interrupted mid-run continues from its last step
+    if agent.sessions is None:
+        return await agent.run(question)
+    session_id = session_id_for(question_id)
+    if agent.sessions.exists(session_id):
+        return await agent.resume(session_id)
+    return await agent.run(question, session_id=session_id)
+
+
+async def run_batch(agent, questions, output_path, concurrency=8):
+    """
+    Answer questions with bounded concurrency, streaming one JSON line per result.
+
+    Args:
+        agent (Agent): The agent to run every question with.
+        questions (list[tuple[str, str]]): (id, question) pairs to answer.
+        output_path (str): The JSONL file results are appended to.
+        concurrency (int): Number of sessions in flight.
+
+    Returns:
+        dict: Totals for the batch: "answered", "failed" and "wall_time_s".
+    """
+
+    queue = asyncio.Queue()
+    for item in questions:
+        queue.put_nowait(item)
+
+    totals = {"answered": 0, "failed": 0}
+    started = time.perf_counter()
+
+    with open(output_path, "a", encoding="utf-8") as out:
+
+        async def worker():
+            while True:
+                try:
+                    question_id, question = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+
+                record = {"id": question_id, "question": question}
+                t0 = time.perf_counter()
+                try:
+                    result = await answer(agent, question_id, question)
+                    record.update(answer=result["answer"], iterations=result["iterations"], stats=result["stats"])
+                    if result["cached"]:
+                        record["cached"] = result["cached"]["match"]
+                    if result["stopped"]:
+                        record["stopped"] = result["stopped"]
+                    totals["answered"] += 1
+                except Exception as e:
+                    record["error"] = f"{type(e).__name__}: {e}"
+                    totals["failed"] += 1
+                record["latency_s"] = round(time.perf_counter() - t0, 3)
+
+                # One complete line per result, flushed right away so a crash loses nothing written
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                out.flush()
+                print(f"[{totals['answered'] + totals['failed']}/{len(questions)}] {question_id} "
+                      f"{'error' if 'error' in record else 'ok'} in {record['latency_s']}s")
+
+        await asyncio.gather(*(worker() for _ in range(min(concurrency, len(questions)) or 1)))
+
+    totals["wall_time_s"] = round(time.perf_counter() - started, 3)
+    return totals
+
+
+async def main(argv=None):
+    parser = argparse.ArgumentParser(description="Answer a JSONL file of questions with the ReAct agent.")
+    parser.add_argument("input", help="JSONL file with one question per line")
+    parser.add_argument("output", help="JSONL file results are appended to (also used to resume)")
+    parser.add_argument("--concurrency", type=int, default=8, help="sessions in flight (default: 8)")
+    parser.add_argument("--rpm", type=float, default=None, help="LLM requests-per-minute limit")
+    parser.add_argument("--tpm", type=float, default=None, help="LLM tokens-per-minute limit")
+    parser.add_argument("--model", default="gpt-4o")
+    parser.add_argument("--small-model", help="route llm_knowledge and early turns to this model (e.g. gpt-4o-mini), "
+                                              "escalating to --model after a format failure")
+    parser.add_argument("--action-mode", choices=["text", "tools"], default="text")
+    parser.add_argument("--max-iterations", type=int, default=25, help="ReAct iterations per question (default: 25)")
+    parser.add_argument("--max-tokens", type=int, default=None, help="prompt + completion tokens per question")
+    parser.add_argument("--deadline", type=float, default=None, help="wall-clock seconds per question")
+    parser.add_argument("--history-budget", type=int, default=6000, help="prompt token budget per turn")
+    parser.add_argument("--rank-passages", action="store_true",
+                        help="fetch full page text and keep only the passages relevant to each search")
+    parser.add_argument("--answer-cache", help="SQLite file of final answers reused for repeated/paraphrased questions")
+    parser.add_argument("--sessions", help="checkpoint sessions to this directory and resume them on re-runs")
+    parser.add_argument("--compress", choices=["zlib", "zstd"], default=None, help="compress session log records")
+    parser.add_argument("--trace", help="append per-iteration spans to this JSONL file")
+    parser.add_argument("--otlp-endpoint", help="also export spans over OTLP/HTTP, e.g. http://localhost:4318/v1/traces")
+    parser.add_argument("--id-field", default="id")
+    parser.add_argument("--question-field", default="question")
+    args = parser.parse_args(argv)
+
+    load_dotenv()
+    set_console_output(False)  # Progress lines below are printed directly
+
+    questions = read_questions(args.input, args.id_field, args.question_field)
+    completed = read_completed_ids(args.output)
+    pending = [(qid, q) for qid, q in questions if qid not in completed]
+    print(f"{len(questions)} questions, {len(completed)} already answered, {len(pending)} to run")
+
+    exporters = []
+    if args.trace:
+        exporters.append(JsonlExporter(args.trace))
+    if args.otlp_endpoint:
+        exporters.append(OtlpHttpExporter(args.otlp_endpoint))
+    tracer = Tracer(exporters) if exporters else None
+
+    search_cache = SearchCache(path="search_cache.sqlite3")
+    answer_cache = AnswerCache(path=args.answer_cache) if args.answer_cache else None
+    sessions = SessionLog(args.sessions, compress=args.compress) if args.sessions else None
+    agent = Agent(
+        model=args.model,
+        verbose=False,
+        action_mode=args.action_mode,
+        search_cache=search_cache,
+        history=HistoryManager(token_budget=args.history_budget),
+        rate_limiter=RateLimiter(requests_per_minute=args.rpm, tokens_per_minute=args.tpm),
+        max_connections=max(args.concurrency * 2, 10),
+        tracer=tracer,
+        sessions=sessions,
+        passage_ranker=PassageRanker() if args.rank_passages else None,
+        answer_cache=answer_cache,
+        router=ModelRouter.small_first(small=args.small_model, large=args.model) if args.small_model else None,
+        budget=RunBudget(max_iterations=args.max_iterations, max_tokens=args.max_tokens, deadline_s=args.deadline)
+    )
+    try:
+        totals = await run_batch(agent, pending, args.output, concurrency=args.concurrency)
+    finally:
+        await agent.aclose()
+        search_cache.close()
+        if answer_cache is not None:
+            answer_cache.close()
+        if sessions is not None:
+            await sessions.aclose()
+        if tracer is not None:
+            await tracer.aclose()
+
+    print(f"Done: {totals['answered']} answered, {totals['failed']} failed in {totals['wall_time_s']}s")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
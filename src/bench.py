@@ -0,0 +1,309 @@
+from replay import Cassette, RecordingOpenAI, RecordingSearch, ReplayOpenAI, ReplaySearch
+from fakeserver import FakeBackend, parse_faults
+from server import AgentServer
+from agent import Agent
+from tracing import set_console_output
+
+from dotenv import load_dotenv
+from collections import Counter
+import subprocess
+import statistics
+import argparse
+import asyncio
+import glob
+import json
+import time
+import sys
+import os
+
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+CASSETTE_DIR = os.path.join(SRC_DIR, "cassettes")
+
+
+async def record(name, question, path, **agent_options):
+    """
+    Run a question live and save every LLM and search exchange to a cassette.
+
+    Args:
+        name (str): Scenario name stored in the cassette.
+        question (str): The question to run.
+        path (str): Where to write the cassette.
+        **agent_options: Extra 'Agent' options (stream, action_mode, ...).
+
+    Returns:
+        dict: The 'Agent.run()' result.
+    """
+
+    cassette = Cassette(name=name, question=question)
+    live = Agent(verbose=False)
+    agent = Agent(
+        client=RecordingOpenAI(live.client, cassette),
+        search_client=RecordingSearch(live.search_client, cassette),
+        verbose=False,
+        **agent_options
+    )
+    try:
+        result = await agent.run(question)
+    finally:
+        await live.aclose()
+    cassette.save(path)
+    return result
+
+
+async def replay_scenario(cassette, latency=0.0, chunk_latency=0.0, search_latency=0.0, **agent_options):
+    """
+    Run a recorded scenario fully offline against local stand-in clients.
+
+    Returns:
+        dict: The 'Agent.run()' result.
+    """
+
+    agent = Agent(
+        client=ReplayOpenAI(cassette, latency=latency, chunk_latency=chunk_latency),
+        search_client=ReplaySearch(cassette, latency=search_latency),
+        verbose=False,
+        **agent_options
+    )
+    return await agent.run(cassette.question)
+
+
+def summarize(name, results):
+    """
+    Aggregate the stats of repeated runs of one scenario.
+    """
+
+    stats = [r["stats"] for r in results]
+    tools = sorted({tool for s in stats for tool in s["tool_time_s"]})
+    wall = [s["wall_time_s"] for s in stats]
+    return {
+        "scenario": name,
+        "runs": len(results),
+        "iterations": results[0]["iterations"],
+        "wall_ms_mean": statistics.mean(wall) * 1000,
+        "wall_ms_min": min(wall) * 1000,
+        "llm_ms_mean": statistics.mean(s["llm_time_s"] for s in stats) * 1000,
+        "parse_ms_mean": statistics.mean(s["parse_time_s"] for s in stats) * 1000,
+        "tool_ms_mean": {
+            tool: statistics.mean(s["tool_time_s"].get(tool, 0.0) for s in stats) * 1000 for tool in tools
+        }
+    }
+
+
+def measure_import_time(module="agent", runs=5):
+    """
+    Measure the cold import time of a module with 'python -X importtime'.
+
+    Every run uses a fresh interpreter. The cumulative time of 'module' is taken
+    from the importtime report, along with its direct imports.
+
+    Args:
+        module (str): The module to import (from the 'src' directory).
+        runs (int): Number of fresh interpreters to average over.
+
+    Returns:
+        dict: "module", "median_ms", "runs_ms" and "children_ms" (median cumulative
+            time of each direct import of 'module', heaviest first).
+    """
+
+    totals, children = [], {}
+    for _ in range(runs):
+        process = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            cwd=SRC_DIR, capture_output=True, text=True, check=True
+        )
+
+        # Lines are "import time: self | cumulative | name", children listed before their parent
+        direct = {}
+        for line in process.stderr.splitlines():
+            if not line.startswith("import time:") or "|" not in line:
+                continue
+            _, cumulative, name = line.split("|")
+            if not cumulative.strip().isdigit():
+                continue
+            depth = (len(name) - len(name.lstrip()) - 1) // 2
+            if depth == 0:
+                if name.strip() == module:
+                    totals.append(int(cumulative) / 1000)
+                    for child, ms in direct.items():
+                        children.setdefault(child, []).append(ms)
+                direct = {}
+            elif depth == 1:
+                direct[name.strip()] = int(cumulative) / 1000
+
+    return {
+        "module": module,
+        "median_ms": statistics.median(totals),
+        "runs_ms": totals,
+        "children_ms": dict(sorted(
+            ((child, statistics.median(ms)) for child, ms in children.items()),
+            key=lambda item: item[1], reverse=True
+        ))
+    }
+
+
+async def load_test(requests=200, concurrency=32, server_concurrency=16, queue=64, queue_timeout=10.0,
+                    latency=0.2, chunk_latency=0.0, faults=(), fault_rate=0.0):
+    """
+    Load-test the HTTP server mode fully offline.
+
+    Starts a 'FakeBackend' for the OpenAI and Tavily APIs and an 'AgentServer' in this
+    process, then streams 'requests' sessions through real HTTP from 'concurrency'
+    clients at once. Nothing reaches the real APIs.
+
+    Returns:
+        dict: Throughput, client-side latency percentiles (total and first event),
+            response status counts, server outcomes and backend request counts.
+    """
+
+    import httpx
+
+    async with FakeBackend(latency=latency, chunk_latency=chunk_latency, faults=faults, fault_rate=fault_rate) as backend:
+        os.environ.update(OPENAI_BASE_URL=f"{backend.url}/v1", TAVILY_BASE_URL=backend.url)
+        os.environ.setdefault("OPENAI_API_KEY", "fake")
+        os.environ.setdefault("TAVILY_API_KEY", "fake")
+
+        agent = Agent(verbose=False, max_connections=max(server_concurrency * 2, 10))
+        server = AgentServer(agent, max_concurrency=server_concurrency, max_queue=queue, queue_timeout=queue_timeout)
+        await server.start()
+
+        latencies, first_events, statuses = [], [], Counter()
+        limit = asyncio.Semaphore(concurrency)
+        try:
+            async with httpx.AsyncClient(timeout=None, limits=httpx.Limits(max_connections=concurrency)) as http:
+
+                async def session(i):
+                    async with limit:
+                        started, first = time.perf_counter(), None
+                        async with http.stream("POST", f"{server.url}/v1/sessions",
+                                               json={"question": f"What is {i} + {i}?"}) as response:
+                            async for line in response.aiter_lines():
+                                if first is None and line.startswith("data:"):
+                                    first = time.perf_counter() - started
+                        statuses[response.status_code] += 1
+                        if response.status_code == 200:
+                            latencies.append(time.perf_counter() - started)
+                            first_events.append(first)
+
+                wall = time.perf_counter()
+                await asyncio.gather(*(session(i) for i in range(requests)))
+                wall = time.perf_counter() - wall
+        finally:
+            await server.aclose()
+            await agent.aclose()
+
+    def percentiles(values):
+        if len(values) < 2:
+            return {"p50_ms": values[0] * 1000 if values else None, "p95_ms": None, "p99_ms": None}
+        cuts = statistics.quantiles(values, n=100)
+        return {"p50_ms": cuts[49] * 1000, "p95_ms": cuts[94] * 1000, "p99_ms": cuts[98] * 1000}
+
+    return {
+        "requests": requests,
+        "wall_s": wall,
+        "sessions_per_s": len(latencies) / wall,
+        "statuses": dict(statuses),
+        "latency": percentiles(latencies),
+        "first_event": percentiles(first_events),
+        "server": dict(server.outcomes),
+        "backend_requests": backend.stats["requests"]
+    }
+
+
+def print_report(rows):
+    print(f"{'scenario':<24}{'iters':>6}{'wall ms':>10}{'min ms':>10}{'llm ms':>10}{'parse ms':>10}  tools ms")
+    for row in rows:
+        tools = ", ".join(f"{tool}={ms:.2f}" for tool, ms in row["tool_ms_mean"].items())
+        print(f"{row['scenario']:<24}{row['iterations']:>6}{row['wall_ms_mean']:>10.2f}{row['wall_ms_min']:>10.2f}"
+              f"{row['llm_ms_mean']:>10.2f}{row['parse_ms_mean']:>10.3f}  {tools}")
+
+
+async def main(argv=None):
+    parser = argparse.ArgumentParser(description="Record ReAct runs to cassettes and benchmark the loop offline.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="replay recorded scenarios offline and report timings")
+    run.add_argument("cassettes", nargs="*", help=f"cassette files (default: all in {CASSETTE_DIR})")
+    run.add_argument("--repeat", type=int, default=5)
+    run.add_argument("--latency", type=float, default=0.0, help="injected seconds per LLM call")
+    run.add_argument("--chunk-latency", type=float, default=0.0, help="injected seconds per streamed chunk")
+    run.add_argument("--search-latency", type=float, default=0.0, help="injected seconds per search call")
+    run.add_argument("--no-stream", action="store_true", help="replay without streaming")
+    run.add_argument("--json", help="also write the report as JSON (for comparing engine changes)")
+
+    imp = commands.add_parser("import", help="measure cold import time with python -X importtime")
+    imp.add_argument("--module", default="agent")
+    imp.add_argument("--runs", type=int, default=5)
+    imp.add_argument("--max-ms", type=float, default=None, help="exit with an error above this median")
+
+    rec = commands.add_parser("record", help="run a question live and save it as a cassette")
+    rec.add_argument("name")
+    rec.add_argument("question")
+    rec.add_argument("--no-stream", action="store_true")
+
+    load = commands.add_parser("load", help="load-test the HTTP server mode against the local fake backend")
+    load.add_argument("--requests", type=int, default=200)
+    load.add_argument("--concurrency", type=int, default=32, help="concurrent clients")
+    load.add_argument("--server-concurrency", type=int, default=16, help="sessions the server runs at once")
+    load.add_argument("--queue", type=int, default=64, help="server queue size before shedding")
+    load.add_argument("--queue-timeout", type=float, default=10.0)
+    load.add_argument("--latency", type=float, default=0.2, help="fake backend seconds per request")
+    load.add_argument("--chunk-latency", type=float, default=0.0)
+    load.add_argument("--faults", type=parse_faults, default=[], help='scripted backend faults, e.g. "429,503"')
+    load.add_argument("--fault-rate", type=float, default=0.0)
+    load.add_argument("--json", help="also write the report as JSON")
+
+    args = parser.parse_args(argv)
+    set_console_output(False)
+
+    if args.command == "load":
+        report = await load_test(args.requests, args.concurrency, args.server_concurrency, args.queue,
+                                 args.queue_timeout, args.latency, args.chunk_latency, args.faults, args.fault_rate)
+        print(f"{report['requests']} requests in {report['wall_s']:.2f}s: {report['sessions_per_s']:.1f} sessions/s, "
+              f"statuses {report['statuses']}, server {report['server']}")
+        for name in ("latency", "first_event"):
+            values = {k: (f"{v:.1f}" if v is not None else "-") for k, v in report[name].items()}
+            print(f"    {name:<12} p50 {values['p50_ms']} ms  p95 {values['p95_ms']} ms  p99 {values['p99_ms']} ms")
+        if args.json:
+            with open(args.json, "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2)
+        return
+
+    if args.command == "import":
+        report = measure_import_time(args.module, args.runs)
+        print(f"import {report['module']}: median {report['median_ms']:.1f} ms over {len(report['runs_ms'])} runs")
+        for child, ms in list(report["children_ms"].items())[:10]:
+            print(f"    {child:<24}{ms:>8.1f} ms")
+        if args.max_ms is not None and report["median_ms"] > args.max_ms:
+            sys.exit(f"import time {report['median_ms']:.1f} ms exceeds the {args.max_ms} ms budget")
+        return
+
+    if args.command == "record":
+        load_dotenv()
+        path = os.path.join(CASSETTE_DIR, f"{args.name}.json")
+        result = await record(args.name, args.question, path, stream=not args.no_stream)
+        print(f"Recorded {result['iterations']} iterations to {path}")
+        return
+
+    rows = []
+    for path in args.cassettes or sorted(glob.glob(os.path.join(CASSETTE_DIR, "*.json"))):
+        results = []
+        for _ in range(args.repeat):
+            cassette = Cassette.load(path)
+            results.append(await replay_scenario(
+                cassette,
+                latency=args.latency,
+                chunk_latency=args.chunk_latency,
+                search_latency=args.search_latency,
+                stream=not args.no_stream
+            ))
+        rows.append(summarize(cassette.name or os.path.basename(path), results))
+
+    print_report(rows)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=2)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,92 @@
+import asyncio
+
+
+class BudgetExhausted(Exception):
+    """
+    Raised inside the loop when a run has to stop early; 'reason' says why.
+    """
+
+    def __init__(self, reason):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class RunBudget:
+    """
+    Limits for a single run.
+
+    Iterations and tokens are checked between iterations. The deadline also
+    interrupts the iteration in flight, cancelling its LLM and tool calls. When a
+    limit is hit and 'finalize' is set, the model gets one last turn, without
+    tools, to give its best answer from what it has seen so far.
+    """
+
+    def __init__(self, max_iterations=25, max_tokens=None, deadline_s=None, finalize=True, finalize_timeout_s=30.0):
+        """
+        Args:
+            max_iterations (int | None): Maximum ReAct iterations.
+            max_tokens (int | None): Maximum prompt + completion tokens of the run.
+            deadline_s (float | None): Wall-clock limit in seconds from the start of the run.
+            finalize (bool): Ask for a best-effort final answer when a limit is hit.
+            finalize_timeout_s (float): Time allowed for that last turn.
+        """
+
+        self.max_iterations = max_iterations
+        self.max_tokens = max_tokens
+        self.deadline_s = deadline_s
+        self.finalize = finalize
+        self.finalize_timeout_s = finalize_timeout_s
+
+    def exceeded(self, iterations, stats, elapsed_s):
+        """
+        Check the limits before starting an iteration.
+
+        Args:
+            iterations (int): The iteration about to start.
+            stats (dict): The run stats so far.
+            elapsed_s (float): Seconds since the run started.
+
+        Returns:
+            str | None: "max_iterations", "max_tokens" or "deadline", or None if within budget.
+        """
+
+        if self.max_iterations is not None and iterations > self.max_iterations:
+            return "max_iterations"
+        if self.max_tokens is not None and stats["prompt_tokens"] + stats["completion_tokens"] >= self.max_tokens:
+            return "max_tokens"
+        if self.deadline_s is not None and elapsed_s >= self.deadline_s:
+            return "deadline"
+        return None
+
+
+class CancelToken:
+    """
+    Cooperative cancellation for a run.
+
+    Call 'cancel()' from anywhere on the event loop. The run stops the iteration
+    in flight (cancelling its LLM and tool calls) and returns normally, with
+    result["stopped"] == "cancelled". Unlike cancelling the task, the session
+    log, spans and stats are closed cleanly.
+    """
+
+    def __init__(self, finalize=False):
+        """
+        Args:
+            finalize (bool): Still ask the model for a best-effort answer after cancelling.
+        """
+
+        self.finalize = finalize
+        self.reason = None
+        self._event = asyncio.Event()
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def cancel(self, reason="cancelled"):
+        if not self.cancelled:
+            self.reason = reason
+            self._event.set()
+
+    async def wait(self):
+        await self._event.wait()
@@ -0,0 +1,485 @@
+from collections import Counter, OrderedDict, defaultdict
+from ranking import WORD_RE
+import hashlib
+import sqlite3
+import json
+import math
+import time
+import re
+
+
+def normalize_query(query):
+    """
+    Normalize a search query so near-identical phrasings share a cache key.
+
+    Lowercases, strips surrounding quotes and trailing punctuation, and collapses
+    internal whitespace, e.g. '  "Current CPI-U?" ' -> 'current cpi-u'.
+
+    Args:
+        query (str): The raw query string.
+
+    Returns:
+        str: The normalized query.
+    """
+
+    query = " ".join(str(query).lower().split())
+    return query.strip("\"'").rstrip("?.! ").strip()
+
+
+def make_cache_key(query, params):
+    """
+    Build a stable cache key from the normalized query plus the search parameters.
+
+    Args:
+        query (str): The raw query string.
+        params (dict): The search parameters sent alongside the query.
+
+    Returns:
+        str: A hex SHA-256 digest.
+    """
+
+    payload = json.dumps({"query": normalize_query(query), "params": params}, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class SearchCache:
+    """
+    Two-tier TTL cache for formatted search results.
+
+    Lookups go to an in-memory LRU first, then to an optional SQLite file on disk.
+    Disk hits are promoted back into memory. Both tiers are size bounded and every
+    entry carries its own expiry time.
+
+    Counters for memory hits, disk hits and misses are kept so the hit rate can be
+    reported per run.
+    """
+
+    def __init__(self, path=None, ttl=3600, max_memory_entries=256, max_disk_entries=10_000, clock=time.time):
+        """
+        Args:
+            path (str | None): SQLite file for the disk tier. None keeps the cache in memory only.
+            ttl (float): Default time-to-live in seconds for new entries.
+            max_memory_entries (int): Size of the in-memory LRU tier.
+            max_disk_entries (int): Maximum number of rows kept on disk.
+            clock (Callable[[], float]): Time source, injectable for offline tests.
+        """
+
+        self.ttl = ttl
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_entries = max_disk_entries
+        self.clock = clock
+
+        self.hits_memory = 0
+        self.hits_disk = 0
+        self.misses = 0
+
+        self._memory = OrderedDict()  # key -> (value, expires_at)
+        self._db = None
+        if path is not None:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS search_cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                "expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS search_cache_accessed ON search_cache (accessed_at)")
+            self._db.commit()
+
+    def get(self, key):
+        """
+        Look up a key in memory, then on disk.
+
+        Args:
+            key (str): The cache key (see 'make_cache_key').
+
+        Returns:
+            str | None: The cached value, or None on a miss or an expired entry.
+        """
+
+        now = self.clock()
+
+        entry = self._memory.get(key)
+        if entry is not None:
+            value, expires_at = entry
+            if expires_at > now:
+                self._memory.move_to_end(key)
+                self.hits_memory += 1
+                return value
+            del self._memory[key]
+
+        if self._db is not None:
+            row = self._db.execute(
+                "SELECT value, expires_at FROM search_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None:
+                value, expires_at = row
+                if expires_at > now:
+                    self._db.execute("UPDATE search_cache SET accessed_at = ? WHERE key = ?", (now, key))
+                    self._db.commit()
+                    self._remember(key, value, expires_at)
+                    self.hits_disk += 1
+                    return value
+                self._db.execute("DELETE FROM search_cache WHERE key = ?", (key,))
+                self._db.commit()
+
+        self.misses += 1
+        return None
+
+    def set(self, key, value, ttl=None):
+        """
+        Store a value in both tiers.
+
+        Args:
+            key (str): The cache key.
+            value (str): The value to cache.
+            ttl (float | None): Time-to-live in seconds; defaults to the cache TTL.
+        """
+
+        now = self.clock()
+        expires_at = now + (self.ttl if ttl is None else ttl)
+        self._remember(key, value, expires_at)
+
+        if self._db is not None:
+            self._db.execute(
+                "INSERT OR REPLACE INTO search_cache (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, value, expires_at, now)
+            )
+            # Evict expired rows, then the least recently used ones beyond the size bound
+            self._db.execute("DELETE FROM search_cache WHERE expires_at <= ?", (now,))
+            self._db.execute(
+                "DELETE FROM search_cache WHERE key IN ("
+                "SELECT key FROM search_cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_disk_entries,)
+            )
+            self._db.commit()
+
+    def _remember(self, key, value, expires_at):
+        self._memory[key] = (value, expires_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def stats(self):
+        """
+        Return the hit/miss counters.
+
+        Returns:
+            dict: 'hits_memory', 'hits_disk', 'misses' and the overall 'hit_rate'.
+        """
+
+        lookups = self.hits_memory + self.hits_disk + self.misses
+        hits = self.hits_memory + self.hits_disk
+        return {
+            "hits_memory": self.hits_memory,
+            "hits_disk": self.hits_disk,
+            "misses": self.misses,
+            "hit_rate": hits / lookups if lookups else 0.0
+        }
+
+    def close(self):
+        """
+        Close the disk tier.
+        """
+
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+
+# ---------------------  Answer cache  ---------------------
+
+NUMBER_RE = re.compile(r"\d+(?:[.,]\d+)*")
+
+# Words that carry no meaning in a question. Not the search stopwords: tense, modal
+# and negation words are kept, so "Who was ..." never matches "Who will be ..."
+QUESTION_STOPWORDS = frozenset(
+    "a about an and any as at by exactly for from how i in it its me my of on or please some tell "
+    "that the there this to what when where which who why with you your".split()
+)
+
+# Tense, modal and negation words; two questions only share an answer if they use the same ones
+QUESTION_MARKERS = frozenset(
+    "am are be been can could did do does had has have is may might must never no not shall "
+    "should was were will would".split()
+)
+
+# "'s" reads as "is" after these words, and as a possessive elsewhere
+IS_CONTRACTED = frozenset("he here how it she that there what when where who why".split())
+
+CONTRACTIONS = {"won't": ["will", "not"], "can't": ["can", "not"], "shan't": ["shall", "not"]}
+CONTRACTION_SUFFIXES = (("n't", "not"), ("'ll", "will"), ("'re", "are"), ("'ve", "have"), ("'d", "would"))
+
+# Questions whose answer depends on the current date the prompt injects, so it is only right that day
+TIME_RELATIVE_RE = re.compile(
+    r"\b(?:today|tonight|tomorrow|yesterday|date|time|ago|until|till|since|"
+    r"(?:this|next|last) (?:week|month|year)|how old|age)\b",
+    re.IGNORECASE
+)
+
+
+def expand_contraction(token):
+    """
+    Split a contraction into its words ("didn't" -> ['did', 'not'], "what's" -> ['what', 'is']).
+    """
+
+    if token in CONTRACTIONS:
+        return CONTRACTIONS[token]
+    for suffix, word in CONTRACTION_SUFFIXES:
+        if token.endswith(suffix) and len(token) > len(suffix):
+            return [token[:-len(suffix)], word]
+    if token.endswith("'s") and token[:-2] in IS_CONTRACTED:
+        return [token[:-2], "is"]
+    return [token]
+
+
+def question_tokens(question):
+    """
+    Content words of a question, normalized so that trivial rewordings compare equal:
+    contractions are expanded, possessives and acronym dots are dropped and plurals
+    are crudely singularized ("What's France's GDP?" -> ['is', 'france', 'gdp'],
+    "U.S. prices" -> ['us', 'price']).
+    """
+
+    tokens = []
+    for word in WORD_RE.findall(question.lower()):
+        for token in expand_contraction(word):
+            token = token.removesuffix("'s").replace(".", "").replace("'", "")
+            if len(token) > 4 and token.endswith("s") and not token.endswith("ss") and token not in QUESTION_MARKERS:
+                token = token[:-1]
+            if token and token not in QUESTION_STOPWORDS:
+                tokens.append(token)
+    return tokens
+
+
+def is_time_relative(question):
+    """
+    Whether the answer to a question depends on the current date ("What's today's date?",
+    "How many days until Christmas?"), so it must not be cached.
+    """
+
+    return TIME_RELATIVE_RE.search(question) is not None
+
+
+def same_order(a, b):
+    """
+    Whether the words two questions share appear in the same order in both, so
+    'USD to EUR' never matches 'EUR to USD'.
+    """
+
+    shared = set(a) & set(b)
+    first = lambda tokens: list(dict.fromkeys(t for t in tokens if t in shared))
+    return first(a) == first(b)
+
+
+class AnswerCache:
+    """
+    Front-of-loop cache of final answers, keyed by question.
+
+    A question hits on an exact match of its normalized text, or on a paraphrase:
+    the most similar cached question by TF-IDF cosine over content words, if it
+    reaches 'threshold', mentions exactly the same numbers, uses the same tense, modal
+    and negation words and has its shared words in the same order. Similarity is computed against an inverted index, so only
+    cached questions sharing a rare word are compared.
+
+    Every answer carries its own expiry. Answers built from 'internet_search'
+    results use the shorter 'search_ttl', since the facts behind them go stale.
+    Questions relative to the current date ("today", "days until ...") are never
+    cached or served.
+    """
+
+    def __init__(self, path=None, ttl=86_400, search_ttl=3_600, threshold=0.75, max_entries=100_000,
+                 clock=time.time):
+        """
+        Args:
+            path (str | None): SQLite file the answers are persisted to. None keeps them in memory only.
+            ttl (float): Time-to-live in seconds of answers that did not use the internet.
+            search_ttl (float): Time-to-live in seconds of answers that used 'internet_search'.
+            threshold (float): Minimum cosine similarity for a paraphrase hit (1.0 disables them).
+            max_entries (int): Answers kept; the oldest are evicted first.
+            clock (Callable[[], float]): Time source, injectable for offline tests.
+        """
+
+        self.ttl = ttl
+        self.search_ttl = search_ttl
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.clock = clock
+
+        self.hits_exact = 0
+        self.hits_similar = 0
+        self.misses = 0
+
+        self._entries = OrderedDict()     # key -> entry, oldest first
+        self._terms = {}                  # key -> Counter of question words
+        self._postings = defaultdict(set) # term -> keys of questions containing it
+
+        self._db = None
+        if path is not None:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS answer_cache ("
+                "key TEXT PRIMARY KEY, entry TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._db.execute("DELETE FROM answer_cache WHERE expires_at <= ?", (clock(),))
+            self._db.commit()
+            rows = self._db.execute(
+                "SELECT key, entry FROM answer_cache ORDER BY expires_at DESC LIMIT ?", (max_entries,)
+            ).fetchall()
+            for key, entry in reversed(rows):
+                self._index(key, json.loads(entry))
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _index(self, key, entry):
+        self._entries[key] = entry
+        self._terms[key] = Counter(question_tokens(entry["question"]))
+        for term in self._terms[key]:
+            self._postings[term].add(key)
+
+    def _forget(self, key):
+        self._entries.pop(key, None)
+        for term in self._terms.pop(key, ()):
+            keys = self._postings[term]
+            keys.discard(key)
+            if not keys:
+                del self._postings[term]
+        if self._db is not None:
+            self._db.execute("DELETE FROM answer_cache WHERE key = ?", (key,))
+            self._db.commit()
+
+    def _live(self, key, now):
+        entry = self._entries.get(key)
+        if entry is not None and entry["expires_at"] <= now:
+            self._forget(key)
+            return None
+        return entry
+
+    def _similarity(self, query_terms, key, idf):
+        terms = self._terms[key]
+        weight = lambda tf, term: (1 + math.log(tf)) * idf(term)
+        dot = sum(weight(tf, t) * weight(terms[t], t) for t, tf in query_terms.items() if t in terms)
+        norm = math.sqrt(sum(weight(tf, t) ** 2 for t, tf in query_terms.items()))
+        other = math.sqrt(sum(weight(tf, t) ** 2 for t, tf in terms.items()))
+        return dot / (norm * other) if norm and other else 0.0
+
+    def lookup(self, question):
+        """
+        Find a fresh cached answer for a question or a paraphrase of it.
+
+        Args:
+            question (str): The incoming question.
+
+        Returns:
+            dict | None: The cached entry ("question", "answer", "tools", "iterations",
+                "created_at", "expires_at") plus "match" ("exact" or "similar") and
+                "similarity", or None on a miss.
+        """
+
+        if is_time_relative(question):
+            self.misses += 1
+            return None
+
+        now = self.clock()
+        key = make_cache_key(question, {})
+        entry = self._live(key, now)
+        if entry is not None:
+            self.hits_exact += 1
+            return {**entry, "match": "exact", "similarity": 1.0}
+
+        best, best_score = None, 0.0
+        tokens = question_tokens(question)
+        query_terms = Counter(tokens)
+        if self.threshold < 1.0 and query_terms:
+            count = len(self._entries)
+            idf = lambda term: math.log((1 + count) / (1 + len(self._postings.get(term, ())))) + 1
+
+            # Only compare questions that share one of the rarest query terms
+            rare = sorted((t for t in query_terms if t in self._postings), key=lambda t: len(self._postings[t]))[:4]
+            numbers = sorted(NUMBER_RE.findall(question))
+            markers = QUESTION_MARKERS.intersection(tokens)
+            for candidate in set().union(*(self._postings[t] for t in rare)):
+                if self._live(candidate, now) is None:
+                    continue
+                other = self._entries[candidate]["question"]
+                other_tokens = question_tokens(other)
+                if sorted(NUMBER_RE.findall(other)) != numbers or QUESTION_MARKERS.intersection(other_tokens) != markers:
+                    continue  # "5 + 5" and "5 + 6", or "was" and "will be", must never share an answer
+                if not same_order(tokens, other_tokens):
+                    continue
+                score = self._similarity(query_terms, candidate, idf)
+                if score > best_score:
+                    best, best_score = candidate, score
+
+        if best is not None and best_score >= self.threshold:
+            self.hits_similar += 1
+            return {**self._entries[best], "match": "similar", "similarity": best_score}
+
+        self.misses += 1
+        return None
+
+    def store(self, question, answer, tools=(), iterations=None):
+        """
+        Cache the final answer of a question.
+
+        Args:
+            question (str): The question as asked.
+            answer (str): The text after 'Final Answer:'.
+            tools (Iterable[str]): Tools used to reach the answer. 'internet_search'
+                selects the shorter 'search_ttl'.
+            iterations (int | None): ReAct iterations the answer took.
+        """
+
+        if is_time_relative(question):
+            return  # Built from today's date, wrong by tomorrow
+
+        now = self.clock()
+        tools = sorted(set(tools))
+        key = make_cache_key(question, {})
+        entry = {
+            "question": question,
+            "answer": answer,
+            "tools": tools,
+            "iterations": iterations,
+            "created_at": now,
+            "expires_at": now + (self.search_ttl if "internet_search" in tools else self.ttl)
+        }
+
+        if key in self._entries:
+            self._forget(key)
+        self._index(key, entry)
+        while len(self._entries) > self.max_entries:
+            self._forget(next(iter(self._entries)))
+
+        if self._db is not None:
+            self._db.execute(
+                "INSERT OR REPLACE INTO answer_cache (key, entry, expires_at) VALUES (?, ?, ?)",
+                (key, json.dumps(entry), entry["expires_at"])
+            )
+            self._db.commit()
+
+    def stats(self):
+        """
+        Return the hit/miss counters.
+
+        Returns:
+            dict: 'hits_exact', 'hits_similar', 'misses' and the overall 'hit_rate'.
+        """
+
+        lookups = self.hits_exact + self.hits_similar + self.misses
+        hits = self.hits_exact + self.hits_similar
+        return {
+            "hits_exact": self.hits_exact,
+            "hits_similar": self.hits_similar,
+            "misses": self.misses,
+            "hit_rate": hits / lookups if lookups else 0.0
+        }
+
+    def close(self):
+        """
+        Close the SQLite file.
+        """
+
+        if self._db is not None:
+            self._db.close()
+            self._db = None
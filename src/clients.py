@@ -0,0 +1,74 @@
+import os
+
+
+TAVILY_API_URL = "https://api.tavily.com"
+
+
+def build_http_client(max_connections=100, max_keepalive_connections=20, timeout=60.0):
+    """
+    Build the shared, pooled HTTP client used for every outbound call.
+
+    A single 'httpx.AsyncClient' is handed to both the OpenAI SDK and the search
+    client, so concurrent sessions reuse the same keep-alive connections instead
+    of opening new sockets per question.
+
+    Args:
+        max_connections (int): Upper bound on concurrently open connections.
+        max_keepalive_connections (int): Idle connections kept around for reuse.
+        timeout (float): Default per-request timeout in seconds.
+
+    Returns:
+        httpx.AsyncClient: The pooled client. Close it with 'await client.aclose()'.
+    """
+
+    import httpx
+
+    return httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections
+        ),
+        timeout=httpx.Timeout(timeout)
+    )
+
+
+class AsyncTavilySearch:
+    """
+    Minimal async Tavily client running on a shared 'httpx.AsyncClient'.
+
+    Mirrors the 'search()' signature of 'tavily.TavilyClient' so tools can call it
+    the same way, but never creates its own connection pool.
+    """
+
+    def __init__(self, api_key, http_client, base_url=None):
+        """
+        Args:
+            api_key (str): The Tavily API key.
+            http_client (httpx.AsyncClient): The shared, pooled HTTP client.
+            base_url (str | None): API root. Defaults to TAVILY_BASE_URL from the environment
+                (e.g. a local stand-in, see fakeserver.py) or the public Tavily API.
+        """
+
+        self._api_key = api_key
+        self._http = http_client
+        self._base_url = (base_url or os.getenv("TAVILY_BASE_URL") or TAVILY_API_URL).rstrip("/")
+
+    async def search(self, query, **params):
+        """
+        Run a Tavily search.
+
+        Args:
+            query (str): The search query.
+            **params: Any other Tavily search parameters (max_results, search_depth, ...).
+
+        Returns:
+            dict: The decoded JSON response (with a "results" list).
+        """
+
+        response = await self._http.post(
+            f"{self._base_url}/search",
+            json={"query": query, **params},
+            headers={"Authorization": f"Bearer {self._api_key}"}
+        )
+        response.raise_for_status()
+        return response.json()
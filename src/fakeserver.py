@@ -0,0 +1,253 @@
+from replay import Cassette, _Player, _chat_request, _chunks_from_completion, _completion_from_chunks
+
+import argparse
+import asyncio
+import random
+import json
+import time
+
+
+DEFAULT_ANSWER = "Thought: I can answer this directly.\nFinal Answer: 42"
+
+STATUS_TEXT = {
+    200: "OK", 400: "Bad Request", 404: "Not Found", 408: "Request Timeout", 429: "Too Many Requests",
+    500: "Internal Server Error", 502: "Bad Gateway", 503: "Service Unavailable", 504: "Gateway Timeout"
+}
+
+
+class FakeBackend:
+    """
+    Local HTTP stand-in for the OpenAI and Tavily APIs that can inject faults.
+
+    Serves 'POST /v1/chat/completions' (JSON or streamed SSE), 'POST /search' and
+    'GET /health' using only asyncio. Responses come from a cassette when one is
+    given, otherwise every completion is 'DEFAULT_ANSWER' and every search returns
+    one canned result. Point an agent at it with the OPENAI_BASE_URL and
+    TAVILY_BASE_URL environment variables.
+
+    Faults are injected before a request is served: first the scripted 'faults'
+    (one per request, in order), then randomly at 'fault_rate'. A fault is either an
+    HTTP status code, answered with an error body and optional Retry-After, or
+    "hang", which holds the request open for 'hang_seconds' to trigger timeouts.
+    """
+
+    def __init__(self, cassette=None, faults=(), fault_rate=0.0, fault_status=503, retry_after=None,
+                 latency=0.0, chunk_latency=0.0, hang_seconds=60.0, paths=None):
+        """
+        Args:
+            cassette (Cassette | None): Recorded run to serve responses from.
+            faults (Iterable[int | str]): Scripted faults for the next requests, in order.
+            fault_rate (float): Probability of a random 'fault_status' once the script is used up.
+            fault_status (int): Status code of random faults.
+            retry_after (float | None): Retry-After seconds sent with 429 and 503 faults.
+            latency (float): Delay in seconds before each response.
+            chunk_latency (float): Delay in seconds between streamed chunks.
+            hang_seconds (float): How long a "hang" fault holds the request.
+            paths (set[str] | None): Only inject faults on these paths (default: every API path).
+        """
+
+        self.chat = _Player(cassette, "chat") if cassette else None
+        self.search = _Player(cassette, "search") if cassette else None
+        self.faults = list(faults)
+        self.fault_rate = fault_rate
+        self.fault_status = fault_status
+        self.retry_after = retry_after
+        self.latency = latency
+        self.chunk_latency = chunk_latency
+        self.hang_seconds = hang_seconds
+        self.paths = paths
+        self.stats = {"requests": 0, "faults": 0, "by_path": {}}
+        self._server = None
+
+    @property
+    def url(self):
+        host, port = self._server.sockets[0].getsockname()[:2]
+        return f"http://{host}:{port}"
+
+    async def start(self, host="127.0.0.1", port=0):
+        """
+        Start listening. Port 0 picks a free port; read it back from 'url'.
+        """
+
+        self._server = await asyncio.start_server(self._handle_connection, host, port)
+        return self
+
+    async def aclose(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    # ---------------------  HTTP  ---------------------
+
+    async def _handle_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                method, path, _ = request_line.decode("latin-1").split(" ", 2)
+
+                headers = {}
+                while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+
+                await self._handle_request(method, path.split("?")[0], body, writer)
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.CancelledError):
+            pass  # Client went away, or the server is shutting down mid "hang"
+        finally:
+            writer.close()
+
+    def _write_head(self, writer, status, headers):
+        lines = [f"HTTP/1.1 {status} {STATUS_TEXT.get(status, 'Error')}"]
+        lines += [f"{name}: {value}" for name, value in headers.items()]
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+
+    async def _send_json(self, writer, status, payload, headers=None):
+        body = json.dumps(payload).encode("utf-8")
+        self._write_head(writer, status, {
+            "Content-Type": "application/json", "Content-Length": len(body), **(headers or {})
+        })
+        writer.write(body)
+        await writer.drain()
+
+    async def _send_sse(self, writer, chunks):
+        self._write_head(writer, 200, {"Content-Type": "text/event-stream", "Transfer-Encoding": "chunked"})
+        for chunk in [*(f"data: {json.dumps(c)}\n\n" for c in chunks), "data: [DONE]\n\n"]:
+            if self.chunk_latency:
+                await asyncio.sleep(self.chunk_latency)
+            data = chunk.encode("utf-8")
+            writer.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+            await writer.drain()
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+    # ---------------------  Routes  ---------------------
+
+    def _next_fault(self, path):
+        if self.paths is not None and path not in self.paths:
+            return None
+        if self.faults:
+            return self.faults.pop(0)
+        if self.fault_rate and random.random() < self.fault_rate:
+            return self.fault_status
+        return None
+
+    async def _handle_request(self, method, path, body, writer):
+        if method == "GET" and path == "/health":
+            return await self._send_json(writer, 200, {"status": "ok", **self.stats})
+
+        self.stats["requests"] += 1
+        self.stats["by_path"][path] = self.stats["by_path"].get(path, 0) + 1
+
+        fault = self._next_fault(path)
+        if fault is not None:
+            self.stats["faults"] += 1
+            if fault == "hang":
+                await asyncio.sleep(self.hang_seconds)
+                return
+            headers = {}
+            if self.retry_after is not None and fault in (429, 503):
+                headers["Retry-After"] = self.retry_after
+            error = {"error": {"message": f"injected fault {fault}", "type": "fake_backend_error", "code": fault}}
+            return await self._send_json(writer, int(fault), error, headers)
+
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        request = json.loads(body or b"{}")
+        if method == "POST" and path.endswith("/chat/completions"):
+            return await self._chat_completion(request, writer)
+        if method == "POST" and path.endswith("/search"):
+            return await self._send_json(writer, 200, self._search(request))
+        return await self._send_json(writer, 404, {"error": {"message": f"no route for {method} {path}"}})
+
+    async def _chat_completion(self, request, writer):
+        if self.chat is not None:
+            recorded = self.chat.next(_chat_request(request))
+        else:
+            recorded = {"completion": {
+                "choices": [{"message": {"role": "assistant", "content": DEFAULT_ANSWER, "tool_calls": None}}],
+                "usage": {"prompt_tokens": 100, "completion_tokens": 12, "total_tokens": 112}
+            }}
+
+        # Fill in the envelope fields the SDK expects from the real API
+        envelope = {"id": f"chatcmpl-fake-{self.stats['requests']}", "created": int(time.time()),
+                    "model": request.get("model", "fake")}
+
+        if request.get("stream"):
+            chunks = recorded.get("chunks") or _chunks_from_completion(recorded["completion"])
+            return await self._send_sse(writer, [
+                {**envelope, "object": "chat.completion.chunk", **chunk,
+                 "choices": [{"index": 0, "finish_reason": None, **c} for c in chunk.get("choices", [])]}
+                for chunk in chunks
+            ])
+
+        completion = recorded.get("completion") or _completion_from_chunks(recorded["chunks"])
+        await self._send_json(writer, 200, {
+            **envelope, "object": "chat.completion", **completion,
+            "choices": [{"index": 0, "finish_reason": "stop", **c} for c in completion["choices"]]
+        })
+
+    def _search(self, request):
+        if self.search is not None:
+            params = {k: v for k, v in request.items() if k != "query"}
+            return self.search.next({"query": request.get("query"), "params": params})
+        return {"query": request.get("query"), "results": [{
+            "title": "Fake result",
+            "url": "https://example.com/fake",
+            "content": f"Canned content for '{request.get('query')}'.",
+            "score": 1.0
+        }]}
+
+
+def parse_faults(value):
+    """
+    Parse a comma-separated fault script such as "429,503,hang".
+    """
+
+    return [item if item == "hang" else int(item) for item in value.split(",") if item]
+
+
+async def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve a local fake OpenAI/Tavily backend that injects faults.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--cassette", help="serve responses from this cassette")
+    parser.add_argument("--faults", type=parse_faults, default=[], help='scripted faults, e.g. "429,503,hang"')
+    parser.add_argument("--fault-rate", type=float, default=0.0, help="probability of a random fault per request")
+    parser.add_argument("--fault-status", type=int, default=503)
+    parser.add_argument("--retry-after", type=float, default=None, help="Retry-After seconds sent with 429/503")
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--chunk-latency", type=float, default=0.0)
+    args = parser.parse_args(argv)
+
+    backend = FakeBackend(
+        cassette=Cassette.load(args.cassette) if args.cassette else None,
+        faults=args.faults,
+        fault_rate=args.fault_rate,
+        fault_status=args.fault_status,
+        retry_after=args.retry_after,
+        latency=args.latency,
+        chunk_latency=args.chunk_latency
+    )
+    await backend.start(args.host, args.port)
+    try:
+        print(f"Fake backend on {backend.url}")
+        print(f"    export OPENAI_BASE_URL={backend.url}/v1 TAVILY_BASE_URL={backend.url}")
+        await asyncio.Event().wait()
+    finally:
+        await backend.aclose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,141 @@
+from utils import shorten
+import re
+
+
+def estimate_tokens(text):
+    """
+    Cheap token estimate for budget decisions (~4 characters per token).
+
+    Args:
+        text (str): Any text.
+
+    Returns:
+        int: The estimated number of tokens.
+    """
+
+    return len(text or "") // 4 + 1
+
+
+def count_message_tokens(messages):
+    """
+    Estimate the prompt tokens of a chat history, including per-message overhead.
+
+    Args:
+        messages (list[dict]): Chat messages with 'role' and 'content'.
+
+    Returns:
+        int: The estimated number of tokens.
+    """
+
+    return sum(estimate_tokens(m.get("content")) + 4 for m in messages)
+
+
+def digest_observation(content, max_chars=300):
+    """
+    Compress an Observation message (or a native tool result) into a short digest.
+
+    Search results keep only their title and URL lines. Any other observation
+    is whitespace-collapsed and truncated. Numbered observations from a
+    multi-action turn are digested one by one and keep their labels.
+
+    Args:
+        content (str): The observation message content.
+        max_chars (int): Maximum characters kept per non-search observation.
+
+    Returns:
+        str: The digest, marked with '[digest]' so the model knows it was shortened.
+    """
+
+    digests = []
+    for block in re.split(r"(?m)^(?=Observation(?: \d+)?:)", content):
+        if not block.strip():
+            continue
+        label, body = "Observation", block
+        if block.startswith("Observation"):
+            label, _, body = block.partition(":")
+        if "Internet Search Results" in body:
+            kept = [line.strip() for line in body.splitlines()
+                    if line.startswith(("Result ", "URL: "))]
+            body = "; ".join(kept) or "No search results found."
+        else:
+            body = shorten(body, width=max_chars)
+        digests.append(f"{label}: [digest] {body}")
+    return "\n".join(digests)
+
+
+class HistoryManager:
+    """
+    Keep the prompt sent on each iteration within a token budget.
+
+    The full chat history is left untouched; 'compact()' builds the view that is
+    actually sent to the model. The system prompt and the question are always
+    kept verbatim, as are the last 'keep_last_turns' turns (assistant message plus
+    the observation that answered it). Older observations are replaced by short
+    digests first, then the oldest turns are dropped until the budget is met.
+    """
+
+    def __init__(self, token_budget=6000, keep_last_turns=3, digest_chars=300):
+        """
+        Args:
+            token_budget (int): Target size of the prompt in (estimated) tokens.
+            keep_last_turns (int): Number of most recent turns never compacted.
+            digest_chars (int): Maximum characters of a non-search observation digest.
+        """
+
+        self.token_budget = token_budget
+        self.keep_last_turns = keep_last_turns
+        self.digest_chars = digest_chars
+
+    def compact(self, messages):
+        """
+        Build the compacted view of a chat history.
+
+        Args:
+            messages (list[dict]): The full chat history (system prompt, question, turns).
+
+        Returns:
+            tuple[list[dict], int]:
+                - The messages to send to the model.
+                - The estimated number of tokens saved versus sending 'messages' as is.
+        """
+
+        full_tokens = count_message_tokens(messages)
+        if full_tokens <= self.token_budget:
+            return messages, 0
+
+        head, rest = messages[:2], messages[2:]
+
+        # Group the remaining messages into turns: an assistant message plus what answered it
+        turns = []
+        for message in rest:
+            if message["role"] == "assistant" or not turns:
+                turns.append([message])
+            else:
+                turns[-1].append(message)
+
+        split = max(len(turns) - self.keep_last_turns, 0)
+        old, recent = turns[:split], turns[split:]
+
+        # First pass: digest the observations (text or native tool results) of older turns
+        old = [
+            [
+                {**m, "content": digest_observation(m["content"], self.digest_chars)}
+                if m["role"] == "tool" or (m["role"] == "user" and m["content"].startswith("Observation")) else m
+                for m in turn
+            ]
+            for turn in old
+        ]
+
+        # Second pass: drop the oldest turns until the budget is met
+        dropped = 0
+        while old and count_message_tokens(head + sum(old + recent, [])) > self.token_budget:
+            old.pop(0)
+            dropped += 1
+
+        compacted = list(head)
+        if dropped:
+            compacted.append({"role": "user", "content": f"[{dropped} earlier step(s) omitted to save space]"})
+        for turn in old + recent:
+            compacted.extend(turn)
+
+        return compacted, max(full_tokens - count_message_tokens(compacted), 0)
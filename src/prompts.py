@@ -1,23 +1,35 @@
-from tools import tools_str, llm_tools
+from tools import registry
 from datetime import datetime
 from pprint import pp
 
 
-current_dt = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+def render_tools(tools):
+    """
+    Render the tool list as stable plain text (one '- name: description' line per tool).
+
+    Unlike the Python repr of the list, the output only depends on the tool names
+    and descriptions, so the system prompt stays byte-identical across runs.
+    """
+
+    return "\n".join(f"    - {tool['name']}: {tool['description']}" for tool in tools)
 
-react_system_prompt = f"""
-    You have access to the following tools:
-    {llm_tools}
 
-    Current date and time: {current_dt}
+def render_system_prompt(tools):
+    """
+    Render the system prompt for the tools of a registry.
+    """
+
+    return f"""
+    You have access to the following tools:
+{render_tools(tools.specs)}
 
     You must use the following format:
         Question: The input question you must answer.
         Thought: You should always think about what to do.
-        Action: The action to take, should only be one of {tools_str}.
+        Action: The action to take, should only be one of {', '.join(tools.names)}.
         Action Input: The input to the action.
         Observation: The result of the action.
-        ... (The Thought/Action/Observation can repeat any number of times)
+        ... (The Thought/Action/Observation can repeat any number of times; see rule 7 for several actions in one turn)
         Thought: I now know the final answer!
         Final Answer: The answer to the original input question.
 
@@ -30,26 +42,73 @@ react_system_prompt = f"""
         Thought: I now know the final answer!
         Final Answer: 10
 
+        ** Example with independent actions in one turn **
+        Question: What is (2 + 3) and (4 * 6)?
+        Thought: These two calculations do not depend on each other, so I can do both at once.
+        Action: calculator_add
+        Action Input: (2, 3)
+        Action: calculator_multiply
+        Action Input: (4, 6)
+        Observation 1: 5
+        Observation 2: 24
+        Thought: I now know the final answer!
+        Final Answer: 5 and 24
+
     ** Important Details **
     1. **All** arithmetic (adding, subtracting, multiplying, dividing) must be done with calculator tools.
-        - When you use one of these calculator tools, you **must** supply a Python tuple of exactly two numbers, e.g.:
+        - When you use one of the two-number calculator tools, you **must** supply a Python tuple of exactly two numbers, e.g.:
             Action Input: (8, 42)
-        - Never output a single number as the Action Input for a calculator tool.
+        - Never output a single number as the Action Input for a two-number calculator tool.
+        - To apply the same operation to many values, make ONE call with a batch instead of one call per pair, e.g.:
+            Action: calculator_multiply
+            Action Input: (1.08, [19.99, 5.49, 102.0])
+        - For anything with more than one operation, prefer a single 'calculator_eval' action with the whole expression
+          on one line. Use ';' to separate named intermediate steps, e.g.:
+            Action: calculator_eval
+            Action Input: F = 321.5 / 256.1; N_adj = 15000000 * F; N_adj
     2. The tool 'llm_knowledge' is only for generating or retrieving textual content, **never** use it for any arithmetic.
     3. The tool 'internet_search' must be used whenever the question requires fresh, up-to-date, or external information
         (e.g., current events, breaking news, live data, or anything the model cannot reliably know).
-        - Action Input for 'internet_search' must always be a plain string query, not a tuple.
+        - Action Input for 'internet_search' must be a plain string query, not a tuple.
         - Example:
             Action: internet_search
             Action Input: "What is the current stock price of Toyota?"
-    4. If a question asks for the current date or time, DO NOT search the internet as this is already provided in your system prompt.
+        - To cover a compound question or several phrasings at once, give a list of up to 5 queries instead.
+          They run in parallel and come back as one merged, de-duplicated result list, e.g.:
+            Action: internet_search
+            Action Input: ["CPI-U all items index July 2025", "BLS CPI news release July 2025"]
+    4. If a question asks for the current date or time, DO NOT search the internet as this is already provided above the question.
     5. You must always provide both:
-        - Action: one of {tools_str}
+        - Action: one of {', '.join(tools.names)}
         - Action Input: formatted correctly.
         Do not invent your own action phrases (e.g. 'I will convert...'). That is not valid.
     6. Write control lines exactly as plain text (no markdown/bold): 'Thought:', 'Action:', 'Action Input:', 'Observation:', and 'Final Answer:'.
+    7. When several steps do not depend on each other's results (e.g. two separate 'internet_search' lookups),
+        write all of their Action / Action Input pairs in the same turn, one pair after another. They run in parallel
+        and their results come back as numbered Observations ('Observation 1:', 'Observation 2:', ...) in the same order.
+        Never put an action in the same turn as an action whose result it needs.
 """
 
+
+# The system prompt is the fixed prefix of every request: rules, tool specs and
+# examples only. Anything that changes per run (date/time, question) goes into the
+# user message after it, so provider-side prompt caching can reuse the prefix.
+react_system_prompt = render_system_prompt(registry)
+_rendered = {registry.version: react_system_prompt}
+
+
+def system_prompt():
+    """
+    The system prompt for the tools registered so far; only re-rendered after tools
+    are added to the registry (e.g. in-house tools registered after import).
+    """
+
+    prompt = _rendered.get(registry.version)
+    if prompt is None:
+        _rendered.clear()
+        prompt = _rendered[registry.version] = render_system_prompt(registry)
+    return prompt
+
 user_prompt = """
 Goal: Produce a final number and a brief explanation, using realistic financial conversions and up-to-date data.
 
@@ -81,22 +140,50 @@ Steps:
     - Then include the ordered list of domains from step 14.
 """
 
-chat_history = [
-    {
-        "role": "system",
-        "content": react_system_prompt
-    },
-    {
-        "role": "user",
-        "content": f"""
-        Question: {user_prompt}
+# Appended to the system prompt when tools are offered as native function calls
+native_tools_note = """
+    ** Native tool calls **
+    The tools above are also available as function calls. Call them directly instead of writing
+    'Action:' / 'Action Input:' lines; independent calls may be made together in one turn.
+    Still write your 'Thought:' first, and finish with 'Final Answer:' as usual.
+"""
+
+
+def build_chat_history(question, native_tools=False):
+    """
+    Build a fresh chat history for a single agent session.
+
+    The system prompt is the byte-stable prefix; the current date and time are
+    computed here, per session, and sent with the question.
+
+    Args:
+        question (str): The question the agent must answer.
+        native_tools (bool): Tell the model to use native function calls for actions.
+
+    Returns:
+        list[dict]: The system prompt followed by the user question.
+    """
+
+    current_dt = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+    return [
+        {
+            "role": "system",
+            "content": system_prompt() + (native_tools_note if native_tools else "")
+        },
+        {
+            "role": "user",
+            "content": f"""
+        Current date and time: {current_dt}
+
+        Question: {question}
         """
-    }
-]
+        }
+    ]
 
 
 if __name__ == "__main__":
-    pp(chat_history)
+    pp(build_chat_history(user_prompt))
 
 
 # user_prompt = """
@@ -0,0 +1,225 @@
+from collections import Counter, defaultdict
+from history import estimate_tokens
+import heapq
+import math
+import re
+
+
+WORD_RE = re.compile(r"[a-z0-9]+(?:[.,'][a-z0-9]+)*")
+
+# Sentence ends (. ! ? followed by space) and blank lines
+SENTENCE_BREAK = re.compile(r"(?<=[.!?])\s+|\n\s*\n")
+
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have how in is it its of on or that the this "
+    "to was were what when where which who will with".split()
+)
+
+
+def tokenize(text):
+    """
+    Lowercase word and number tokens without stopwords ('3.2%' -> '3.2', "U.S." -> 'u.s').
+    """
+
+    return [t for t in WORD_RE.findall(text.lower()) if t not in STOPWORDS]
+
+
+def iter_sentences(chunks, max_chars=2000):
+    """
+    Lazily split text into whitespace-normalized sentences.
+
+    Args:
+        chunks (str | Iterable[str]): The text, whole or as streamed pieces.
+        max_chars (int): Text without a sentence break is cut at this length.
+
+    Yields:
+        str: One sentence at a time.
+    """
+
+    if isinstance(chunks, str):
+        chunks = (chunks,)
+
+    buffer = ""
+    for chunk in chunks:
+        buffer += chunk
+        *sentences, buffer = SENTENCE_BREAK.split(buffer)
+        while len(buffer) > max_chars:
+            sentences.append(buffer[:max_chars])
+            buffer = buffer[max_chars:]
+        for sentence in sentences:
+            if sentence.strip():
+                yield " ".join(sentence.split())
+    if buffer.strip():
+        yield " ".join(buffer.split())
+
+
+def iter_passages(chunks, max_words=80, overlap_sentences=1):
+    """
+    Lazily group sentences into passages of about 'max_words' words.
+
+    Each passage repeats the last 'overlap_sentences' sentences of the previous one,
+    so a fact split across a boundary still lands in one passage. Sentences longer
+    than 'max_words' are split into word windows.
+
+    Args:
+        chunks (str | Iterable[str]): The text, whole or as streamed pieces.
+        max_words (int): Target passage length in words.
+        overlap_sentences (int): Sentences carried over between consecutive passages.
+
+    Yields:
+        str: One passage at a time.
+    """
+
+    window, words, fresh = [], 0, False
+    for sentence in iter_sentences(chunks):
+        pieces = sentence.split()
+        for start in range(0, len(pieces), max_words):
+            piece = pieces[start:start + max_words]
+            if fresh and words + len(piece) > max_words:
+                yield " ".join(window)
+                window = window[-overlap_sentences:] if overlap_sentences else []
+                words = sum(len(s.split()) for s in window)
+                fresh = False
+            window.append(" ".join(piece))
+            words += len(piece)
+            fresh = True
+    if fresh:
+        yield " ".join(window)
+
+
+class BM25Index:
+    """
+    In-memory Okapi BM25 index over short passages.
+
+    Postings are kept per term, so a query only touches the passages that contain
+    one of its terms.
+    """
+
+    def __init__(self, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.passages = []          # (text, source)
+        self.lengths = []
+        self.total_length = 0
+        self.postings = defaultdict(list)  # term -> [(passage index, term frequency)]
+
+    def __len__(self):
+        return len(self.passages)
+
+    def add(self, text, source=None):
+        tokens = tokenize(text)
+        index = len(self.passages)
+        self.passages.append((text, source))
+        self.lengths.append(len(tokens))
+        self.total_length += len(tokens)
+        for term, frequency in Counter(tokens).items():
+            self.postings[term].append((index, frequency))
+
+    def search(self, query, top_k=None):
+        """
+        Rank the passages that share at least one term with 'query'.
+
+        Args:
+            query (str): The query text.
+            top_k (int | None): Number of passages to return (all matches if None).
+
+        Returns:
+            list[tuple[float, str, Any]]: (score, text, source), best first.
+        """
+
+        if not self.passages:
+            return []
+
+        count = len(self.passages)
+        average_length = self.total_length / count or 1
+        scores = defaultdict(float)
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for index, frequency in postings:
+                norm = self.k1 * (1 - self.b + self.b * self.lengths[index] / average_length)
+                scores[index] += idf * frequency * (self.k1 + 1) / (frequency + norm)
+
+        best = heapq.nlargest(top_k or len(scores), scores.items(), key=lambda item: item[1])
+        return [(score, *self.passages[index]) for index, score in best]
+
+
+class PassageRanker:
+    """
+    Keep only the passages of search results that are relevant to the query.
+
+    The full page text of every result is split into passages and ranked against
+    the query with BM25. The best passages are kept up to 'top_k' and a token budget.
+    Everything runs locally on CPU.
+    """
+
+    def __init__(self, top_k=6, token_budget=600, passage_words=80, max_results=5, max_chars_per_result=50_000):
+        """
+        Args:
+            top_k (int): Maximum number of passages kept.
+            token_budget (int): Maximum estimated tokens of all kept passages together.
+            passage_words (int): Target passage length in words.
+            max_results (int): Results requested from the search API (more candidates
+                are cheap, since only the best passages reach the model).
+            max_chars_per_result (int): Page text read per result.
+        """
+
+        self.top_k = top_k
+        self.token_budget = token_budget
+        self.passage_words = passage_words
+        self.max_results = max_results
+        self.max_chars_per_result = max_chars_per_result
+
+    @property
+    def search_params(self):
+        # Overrides for the search API call: full page text and more candidates
+        return {"include_raw_content": True, "max_results": self.max_results}
+
+    @property
+    def settings(self):
+        # Everything that changes the output, for the search cache key
+        return {"top_k": self.top_k, "token_budget": self.token_budget, "passage_words": self.passage_words,
+                "max_chars_per_result": self.max_chars_per_result}
+
+    def select(self, query, results):
+        """
+        Pick the best passages of the results for a query.
+
+        Args:
+            query (str): The search query.
+            results (list[dict]): Search results with 'content' and optionally 'raw_content'.
+
+        Returns:
+            list[tuple[float, str, dict]]: (score, passage, result), best first. When no
+                passage shares a term with the query, the opening passage of each result
+                is returned with a score of 0.
+        """
+
+        index, leads = BM25Index(), []
+        for result in results:
+            snippet = result.get("content") or ""
+            raw = (result.get("raw_content") or "")[:self.max_chars_per_result]
+            if snippet:
+                index.add(" ".join(snippet.split()), result)
+            for i, passage in enumerate(iter_passages(raw, self.passage_words)):
+                index.add(passage, result)
+                if i == 0 and not snippet:
+                    leads.append((0.0, passage, result))
+            if snippet:
+                leads.append((0.0, " ".join(snippet.split()), result))
+
+        selected, seen, used = [], set(), 0
+        for score, passage, result in index.search(query) or leads:
+            if passage in seen:
+                continue
+            cost = estimate_tokens(passage)
+            if used + cost > self.token_budget:
+                continue  # A shorter, lower-ranked passage may still fit
+            selected.append((score, passage, result))
+            seen.add(passage)
+            used += cost
+            if len(selected) == self.top_k:
+                break
+        return selected
@@ -0,0 +1,93 @@
+import asyncio
+import time
+
+
+class TokenBucket:
+    """
+    Async token bucket refilled continuously at 'rate_per_minute'.
+
+    Waiters are served in FIFO order. The balance may go negative through
+    'adjust()' when a request turns out to cost more than estimated; later
+    acquirers then wait until the debt is paid back.
+    """
+
+    def __init__(self, rate_per_minute, capacity=None, clock=time.monotonic):
+        """
+        Args:
+            rate_per_minute (float): Refill rate.
+            capacity (float | None): Burst size; defaults to one minute of refill.
+            clock (Callable[[], float]): Monotonic time source.
+        """
+
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity or rate_per_minute
+        self.clock = clock
+        self.tokens = self.capacity
+        self._updated = clock()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, amount=1):
+        """
+        Wait until 'amount' tokens are available, then take them.
+
+        Requests larger than the capacity are clamped so they can still proceed.
+        """
+
+        amount = min(amount, self.capacity)
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+
+    def adjust(self, delta):
+        """
+        Charge (positive) or refund (negative) tokens after the fact.
+        """
+
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens - delta)
+
+
+class RateLimiter:
+    """
+    Requests-per-minute and tokens-per-minute limits shared by every session.
+
+    Callers 'acquire()' an estimated token cost before each LLM call and 'settle()'
+    the difference once the real usage is known.
+    """
+
+    def __init__(self, requests_per_minute=None, tokens_per_minute=None):
+        """
+        Args:
+            requests_per_minute (float | None): RPM limit, None for unlimited.
+            tokens_per_minute (float | None): TPM limit, None for unlimited.
+        """
+
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+
+    async def acquire(self, tokens):
+        """
+        Wait for one request slot and 'tokens' (estimated) tokens.
+        """
+
+        if self.requests is not None:
+            await self.requests.acquire(1)
+        if self.tokens is not None:
+            await self.tokens.acquire(tokens)
+
+    def settle(self, estimated, actual):
+        """
+        Correct the token bucket once the real usage of a call is known.
+        """
+
+        if self.tokens is not None:
+            self.tokens.adjust(actual - estimated)
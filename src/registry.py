@@ -0,0 +1,276 @@
+import inspect
+import json
+
+
+class UnknownToolError(ValueError):
+    """
+    Raised for an action name that is not a registered tool.
+    """
+
+
+# Arguments supplied by the agent for each backend, never by the model
+BACKEND_ARGUMENTS = {
+    None: (),
+    "llm": ("client", "model"),
+    "search": ("client", "cache", "ranker"),
+}
+
+
+def coerce_value(value, schema, path):
+    """
+    Check one argument against its JSON schema, converting where it is unambiguous
+    (numeric strings to numbers, tuples to lists, scalars to strings).
+
+    Args:
+        value (Any): The argument value.
+        schema (dict): Its JSON schema ("type", "anyOf", "items", "maxItems" are checked).
+        path (str): The argument name, for error messages.
+
+    Returns:
+        Any: The converted value.
+
+    Raises:
+        ValueError: If the value does not match the schema.
+    """
+
+    if "anyOf" in schema:
+        for option in schema["anyOf"]:
+            try:
+                return coerce_value(value, option, path)
+            except ValueError:
+                continue
+        raise ValueError(f"'{path}' has an invalid value: {value!r}")
+
+    kind = schema.get("type")
+    if kind in ("number", "integer"):
+        if isinstance(value, str):
+            try:
+                value = float(value) if kind == "number" and not value.strip().lstrip("+-").isdigit() else int(value)
+            except ValueError:
+                raise ValueError(f"'{path}' must be a {kind}, got {value!r}") from None
+        if isinstance(value, bool) or not isinstance(value, int if kind == "integer" else (int, float)):
+            raise ValueError(f"'{path}' must be a {kind}, got {value!r}")
+        return value
+    if kind == "string":
+        if isinstance(value, (list, tuple, dict)) or value is None:
+            raise ValueError(f"'{path}' must be a string, got {value!r}")
+        return str(value)
+    if kind == "array":
+        if not isinstance(value, (list, tuple)):
+            raise ValueError(f"'{path}' must be a list, got {value!r}")
+        if "maxItems" in schema and len(value) > schema["maxItems"]:
+            raise ValueError(f"'{path}' takes at most {schema['maxItems']} items")
+        items = schema.get("items")
+        return [coerce_value(v, items, f"{path}[{i}]") for i, v in enumerate(value)] if items else list(value)
+    if kind == "boolean" and not isinstance(value, bool):
+        raise ValueError(f"'{path}' must be true or false, got {value!r}")
+    if kind == "object" and not isinstance(value, dict):
+        raise ValueError(f"'{path}' must be an object, got {value!r}")
+    return value
+
+
+class Tool:
+    """
+    One registered tool: the function, its description and parameter schema, and
+    how the agent runs it.
+
+    'backend' names the shared resources the agent injects: "llm" tools are called
+    with the OpenAI client and the routed model, "search" tools with the search
+    client, result cache and passage ranker. Both run with the agent's retry policy
+    and circuit breaker for that provider. Tools without a backend are plain
+    functions of their arguments; sync ones run inline on the event loop (in a
+    thread if they have a timeout).
+    """
+
+    def __init__(self, func, name, description, properties, required, backend=None, timeout=None,
+                 cacheable=False, parse_text=None):
+        """
+        Args:
+            func (Callable): The tool, sync or async.
+            name (str): The action name the model uses.
+            description (str): What the tool does, shown to the model.
+            properties (dict): JSON schema of each argument.
+            required (Sequence[str]): Arguments that must be given.
+            backend (str | None): None, "llm" or "search".
+            timeout (float | None): Seconds before a call is abandoned; its observation says so.
+            cacheable (bool): The result only depends on the arguments, so the agent may
+                serve repeated calls from its result cache.
+            parse_text (Callable[[str], dict] | None): Turns a text-format 'Action Input'
+                into arguments. By default a one-argument tool gets the raw text, and
+                others take a JSON object.
+        """
+
+        self.func = func
+        self.name = name
+        self.description = description
+        self.properties = properties
+        self.required = tuple(required)
+        self.backend = backend
+        self.timeout = timeout
+        self.cacheable = cacheable
+        self.parse_text = parse_text
+        self.is_async = inspect.iscoroutinefunction(func)
+
+    @property
+    def parameters(self):
+        return {"type": "object", "properties": self.properties, "required": list(self.required)}
+
+    @property
+    def spec(self):
+        return {"name": self.name, "description": self.description, "parameters": self.parameters}
+
+    @property
+    def schema(self):
+        # OpenAI function-calling schema
+        return {"type": "function", "function": self.spec}
+
+    def coerce(self, arguments):
+        """
+        Validate tool-call arguments against the schema.
+
+        Unknown arguments and None values are dropped, so the function defaults apply.
+
+        Returns:
+            dict: Keyword arguments for the tool.
+
+        Raises:
+            ValueError: If a required argument is missing or a value does not match.
+        """
+
+        missing = [name for name in self.required if arguments.get(name) is None]
+        if missing:
+            raise ValueError(f"missing argument(s): {', '.join(missing)}")
+        return {name: coerce_value(value, self.properties[name], name)
+                for name, value in arguments.items()
+                if name in self.properties and value is not None}
+
+    def parse(self, text):
+        """
+        Turn the raw text after 'Action Input:' into validated keyword arguments.
+        """
+
+        text = text.strip()
+        if self.parse_text is not None:
+            arguments = self.parse_text(text)
+        elif len(self.properties) == 1:
+            arguments = {next(iter(self.properties)): text}
+        else:
+            arguments = json.loads(text)
+            if not isinstance(arguments, dict):
+                raise ValueError(f"'{self.name}' takes a JSON object of arguments")
+        return self.coerce(arguments)
+
+
+class ToolRegistry:
+    """
+    The tools offered to the model, in registration order.
+
+    The prompt tool list, the function-calling schemas and the argument parsing all
+    come from here, and the agent builds its dispatch table from it.
+    """
+
+    def __init__(self):
+        self._tools = {}
+        self._views = {}  # name -> (version, value), rebuilt after a registration
+        self.version = 0
+
+    def __contains__(self, name):
+        return name in self._tools
+
+    def __iter__(self):
+        return iter(self._tools.values())
+
+    def __len__(self):
+        return len(self._tools)
+
+    def tool(self, name=None, description=None, parameters=None, required=None, backend=None, timeout=None,
+             cacheable=False, parse_text=None):
+        """
+        Decorator that registers a function as a tool.
+
+        Args:
+            name (str | None): Action name, defaults to the function name.
+            description (str | None): Defaults to the first paragraph of the docstring.
+            parameters (dict | None): JSON schema of each argument the model supplies.
+                Arguments left out default to {"type": "string"}.
+            required (Sequence[str] | None): Defaults to the function's arguments
+                without a default value.
+            backend, timeout, cacheable, parse_text: See 'Tool'.
+
+        Returns:
+            Callable: The decorator; it returns the function unchanged.
+        """
+
+        if backend not in BACKEND_ARGUMENTS:
+            raise ValueError(f"unknown backend '{backend}', must be one of {list(BACKEND_ARGUMENTS)}")
+
+        def register(func):
+            injected = BACKEND_ARGUMENTS[backend]
+            signature = [p for p in inspect.signature(func).parameters.values() if p.name not in injected]
+            properties = {p.name: {"type": "string"} for p in signature}
+            properties.update(parameters or {})
+            doc = description or (inspect.getdoc(func) or "").split("\n\n")[0].replace("\n", " ")
+            self.register(Tool(
+                func,
+                name=name or func.__name__,
+                description=doc,
+                properties=properties,
+                required=required if required is not None else [p.name for p in signature if p.default is p.empty],
+                backend=backend,
+                timeout=timeout,
+                cacheable=cacheable,
+                parse_text=parse_text
+            ))
+            return func
+
+        return register
+
+    def register(self, tool):
+        if tool.name in self._tools:
+            raise ValueError(f"tool '{tool.name}' is already registered")
+        self._tools[tool.name] = tool
+        self.version += 1
+
+    def get(self, name):
+        """
+        Look up a tool by action name.
+
+        Raises:
+            UnknownToolError: If no tool has that name.
+        """
+
+        tool = self._tools.get(name)
+        if tool is None:
+            raise UnknownToolError(f"unknown tool '{name}', must be one of {', '.join(self.names)}")
+        return tool
+
+    def _view(self, name, build):
+        cached = self._views.get(name)
+        if cached is None or cached[0] != self.version:
+            cached = self._views[name] = (self.version, build())
+        return cached[1]
+
+    @property
+    def names(self):
+        return self._view("names", lambda: list(self._tools))
+
+    @property
+    def specs(self):
+        return self._view("specs", lambda: [tool.spec for tool in self])
+
+    @property
+    def schemas(self):
+        # Sent with every native tool-call turn, so built once per registry version
+        return self._view("schemas", lambda: [tool.schema for tool in self])
+
+    def parse(self, name, text):
+        # Text-format Action Input -> keyword arguments
+        return self.get(name).parse(text)
+
+    def coerce(self, name, arguments):
+        # Native tool-call arguments -> keyword arguments
+        return self.get(name).coerce(arguments)
+
+
+# The registry every built-in tool is declared in (see 'tools.py')
+registry = ToolRegistry()
@@ -0,0 +1,265 @@
+from types import SimpleNamespace
+import asyncio
+import hashlib
+import json
+
+
+def to_namespace(value):
+    """
+    Recursively turn decoded JSON into attribute-accessible objects, so recorded
+    responses look like the SDK objects the agent reads ('completion.choices[0]...').
+    """
+
+    if isinstance(value, dict):
+        return SimpleNamespace(**{k: to_namespace(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return [to_namespace(v) for v in value]
+    return value
+
+
+def to_plain(value):
+    """
+    Turn an SDK response object (pydantic model) or namespace into plain JSON data.
+    """
+
+    if hasattr(value, "model_dump"):
+        return value.model_dump(mode="json")
+    if isinstance(value, SimpleNamespace):
+        return {k: to_plain(v) for k, v in vars(value).items()}
+    if isinstance(value, list):
+        return [to_plain(v) for v in value]
+    return value
+
+
+def request_key(kind, request):
+    """
+    Stable hash of a recorded request, used to match replayed calls.
+    """
+
+    payload = json.dumps({"kind": kind, "request": request}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class Cassette:
+    """
+    Ordered log of every LLM and search exchange of a run.
+
+    Each interaction is {"kind": "chat" | "search", "key", "request", "response"}.
+    Chat responses are stored either as one completion ("completion") or as the list
+    of streamed chunks ("chunks"); replay converts between the two as needed, so a
+    cassette can be replayed with or without streaming.
+    """
+
+    def __init__(self, name="", question="", interactions=None):
+        self.name = name
+        self.question = question
+        self.interactions = interactions or []
+
+    def add(self, kind, request, response):
+        self.interactions.append({
+            "kind": kind,
+            "key": request_key(kind, request),
+            "request": request,
+            "response": response
+        })
+
+    def save(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"version": 1, "name": self.name, "question": self.question,
+                       "interactions": self.interactions}, f, indent=1, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(data.get("name", ""), data.get("question", ""), data["interactions"])
+
+
+def _chat_request(kwargs):
+    # The parts of a chat request that define the exchange (not transport options)
+    return {k: kwargs[k] for k in ("model", "messages", "tools", "stream") if k in kwargs}
+
+
+# ---------------------  Recording  ---------------------
+
+class _RecordingStream:
+    def __init__(self, stream, on_done):
+        self._stream = stream
+        self._chunks = []
+        self._on_done = on_done
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        async for chunk in self._stream:
+            self._chunks.append(to_plain(chunk))
+            yield chunk
+
+    async def close(self):
+        await self._stream.close()
+        # Only what the agent actually consumed is recorded, matching a cut-short stream
+        self._on_done({"chunks": self._chunks})
+
+
+class _RecordingCompletions:
+    def __init__(self, completions, cassette):
+        self._completions = completions
+        self._cassette = cassette
+
+    async def create(self, **kwargs):
+        request = _chat_request(kwargs)
+        response = await self._completions.create(**kwargs)
+        if kwargs.get("stream"):
+            return _RecordingStream(response, lambda recorded: self._cassette.add("chat", request, recorded))
+        self._cassette.add("chat", request, {"completion": to_plain(response)})
+        return response
+
+
+class RecordingOpenAI:
+    """
+    Wraps an 'AsyncOpenAI' client and records every chat completion into a cassette.
+    """
+
+    def __init__(self, client, cassette):
+        self.chat = SimpleNamespace(completions=_RecordingCompletions(client.chat.completions, cassette))
+
+
+class RecordingSearch:
+    """
+    Wraps an async search client and records every 'search()' exchange into a cassette.
+    """
+
+    def __init__(self, client, cassette):
+        self._client = client
+        self._cassette = cassette
+
+    async def search(self, query, **params):
+        response = await self._client.search(query=query, **params)
+        self._cassette.add("search", {"query": query, "params": params}, response)
+        return response
+
+
+# ---------------------  Replay  ---------------------
+
+class _Player:
+    """
+    Serves recorded responses of one kind.
+
+    A request is matched on its exact key first; if the request differs from the
+    recording (e.g. the date in the prompt), the next unused response is served in
+    recorded order.
+    """
+
+    def __init__(self, cassette, kind):
+        self._interactions = [i for i in cassette.interactions if i["kind"] == kind]
+        self._used = [False] * len(self._interactions)
+        self.kind = kind
+
+    def next(self, request):
+        key = request_key(self.kind, request)
+        candidates = [i for i, x in enumerate(self._interactions) if not self._used[i] and x["key"] == key]
+        if not candidates:
+            candidates = [i for i, used in enumerate(self._used) if not used]
+        if not candidates:
+            raise LookupError(f"cassette has no more '{self.kind}' interactions")
+        index = candidates[0]
+        self._used[index] = True
+        return self._interactions[index]["response"]
+
+
+def _completion_from_chunks(chunks):
+    content, usage = [], None
+    for chunk in chunks:
+        if chunk.get("choices"):
+            content.append(chunk["choices"][0]["delta"].get("content") or "")
+        if chunk.get("usage"):
+            usage = chunk["usage"]
+    return {"choices": [{"message": {"role": "assistant", "content": "".join(content), "tool_calls": None}}],
+            "usage": usage}
+
+
+def _chunks_from_completion(completion, piece_chars=4):
+    content = completion["choices"][0]["message"].get("content") or ""
+    chunks = [{"choices": [{"delta": {"content": content[i:i + piece_chars]}}], "usage": None}
+              for i in range(0, len(content), piece_chars)]
+    chunks.append({"choices": [], "usage": completion.get("usage")})
+    return chunks
+
+
+class _ReplayStream:
+    def __init__(self, chunks, chunk_latency):
+        self._chunks = chunks
+        self._chunk_latency = chunk_latency
+        self.closed = False
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for chunk in self._chunks:
+            if self.closed:
+                return
+            if self._chunk_latency:
+                await asyncio.sleep(self._chunk_latency)
+            yield to_namespace(chunk)
+
+    async def close(self):
+        self.closed = True
+
+
+class _ReplayCompletions:
+    def __init__(self, player, latency, chunk_latency):
+        self._player = player
+        self._latency = latency
+        self._chunk_latency = chunk_latency
+        self.calls = 0
+
+    async def create(self, **kwargs):
+        self.calls += 1
+        recorded = self._player.next(_chat_request(kwargs))
+        if self._latency:
+            await asyncio.sleep(self._latency)
+
+        if kwargs.get("stream"):
+            chunks = recorded.get("chunks") or _chunks_from_completion(recorded["completion"])
+            return _ReplayStream(chunks, self._chunk_latency)
+
+        completion = recorded.get("completion") or _completion_from_chunks(recorded["chunks"])
+        return to_namespace(completion)
+
+
+class ReplayOpenAI:
+    """
+    Local stand-in for 'AsyncOpenAI' that serves chat completions from a cassette.
+
+    Args:
+        cassette (Cassette): The recorded run.
+        latency (float): Injected delay in seconds before each response.
+        chunk_latency (float): Injected delay in seconds between streamed chunks.
+    """
+
+    def __init__(self, cassette, latency=0.0, chunk_latency=0.0):
+        self.chat = SimpleNamespace(completions=_ReplayCompletions(_Player(cassette, "chat"), latency, chunk_latency))
+
+
+class ReplaySearch:
+    """
+    Local stand-in for the search client that serves 'search()' responses from a cassette.
+
+    Args:
+        cassette (Cassette): The recorded run.
+        latency (float): Injected delay in seconds before each response.
+    """
+
+    def __init__(self, cassette, latency=0.0):
+        self._player = _Player(cassette, "search")
+        self._latency = latency
+        self.calls = 0
+
+    async def search(self, query, **params):
+        self.calls += 1
+        recorded = self._player.next({"query": query, "params": params})
+        if self._latency:
+            await asyncio.sleep(self._latency)
+        return recorded
@@ -0,0 +1,262 @@
+from email.utils import parsedate_to_datetime
+import asyncio
+import random
+import time
+
+
+class CircuitOpenError(Exception):
+    """
+    Raised instead of calling a provider whose circuit breaker is open.
+    """
+
+
+# Exception class names (across openai, httpx and asyncio) that mean "try again"
+RETRYABLE_ERROR_NAMES = {
+    "APITimeoutError", "APIConnectionError", "RateLimitError", "InternalServerError",
+    "TimeoutException", "ConnectTimeout", "ReadTimeout", "WriteTimeout", "PoolTimeout",
+    "ConnectError", "ReadError", "RemoteProtocolError", "TimeoutError"
+}
+
+
+def status_code(exc):
+    """
+    HTTP status carried by an SDK or httpx exception, if any.
+    """
+
+    code = getattr(exc, "status_code", None)
+    if code is None:
+        code = getattr(getattr(exc, "response", None), "status_code", None)
+    return code
+
+
+def is_retryable(exc):
+    """
+    Whether an error is transient: 408/409/429/5xx responses, timeouts and connection errors.
+
+    Client errors such as 400 or 401 are not retried, since repeating them cannot help.
+    """
+
+    code = status_code(exc)
+    if code is not None:
+        return code in (408, 409, 429) or code >= 500
+    return any(cls.__name__ in RETRYABLE_ERROR_NAMES for cls in type(exc).__mro__)
+
+
+def retry_after(exc):
+    """
+    Delay in seconds requested by the server via 'Retry-After' / 'retry-after-ms', if any.
+    """
+
+    headers = getattr(getattr(exc, "response", None), "headers", None)
+    if not headers:
+        return None
+
+    if headers.get("retry-after-ms"):
+        try:
+            return float(headers["retry-after-ms"]) / 1000
+        except ValueError:
+            pass
+
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        try:
+            return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+        except (TypeError, ValueError):
+            return None
+
+
+class RetryPolicy:
+    """
+    How an outbound call is retried.
+
+    Delays use full-jitter exponential backoff (a random delay up to
+    base_delay * 2**attempt, capped at max_delay) unless the server asks for a
+    specific delay with Retry-After.
+    """
+
+    def __init__(self, max_attempts=4, base_delay=0.5, max_delay=20.0,
+                 attempt_timeout=None, deadline=None, hedge_after=None):
+        """
+        Args:
+            max_attempts (int): Total attempts, including the first one.
+            base_delay (float): Backoff base in seconds.
+            max_delay (float): Upper bound for a single backoff delay in seconds.
+            attempt_timeout (float | None): Per-attempt timeout in seconds.
+            deadline (float | None): Overall time budget in seconds for all attempts.
+            hedge_after (float | None): Start a second, identical request if the first has
+                not finished after this many seconds, and keep whichever finishes first.
+        """
+
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.attempt_timeout = attempt_timeout
+        self.deadline = deadline
+        self.hedge_after = hedge_after
+
+    def backoff(self, attempt):
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+
+class CircuitBreaker:
+    """
+    Stops calling a provider after repeated failures.
+
+    After 'failure_threshold' consecutive transient failures the circuit opens and
+    calls fail fast with 'CircuitOpenError'. After 'reset_timeout' seconds one trial
+    call is let through (half-open); its success closes the circuit again.
+    """
+
+    def __init__(self, name, failure_threshold=5, reset_timeout=30.0, clock=time.monotonic):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if self.clock() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def before_call(self):
+        """
+        Raise 'CircuitOpenError' if the call must not go out.
+
+        Returns:
+            bool: Whether the call is the half-open trial.
+        """
+
+        state = self.state
+        if state == "open" or (state == "half_open" and self._trial_in_flight):
+            raise CircuitOpenError(f"circuit '{self.name}' is open after {self.failures} failures")
+        if state == "half_open":
+            self._trial_in_flight = True
+            return True
+        return False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+
+    def release_trial(self):
+        # The trial call was cancelled: it says nothing about the provider, so let another one through
+        self._trial_in_flight = False
+
+    def record_failure(self):
+        self.failures += 1
+        self._trial_in_flight = False
+        if self.failures >= self.failure_threshold or self.opened_at is not None:
+            self.opened_at = self.clock()
+
+
+# Process-wide breakers, so every session and agent shares one view of each provider
+_breakers = {}
+
+
+def get_breaker(name, **options):
+    """
+    Return the shared circuit breaker for a provider, creating it on first use.
+    """
+
+    if name not in _breakers:
+        _breakers[name] = CircuitBreaker(name, **options)
+    return _breakers[name]
+
+
+async def _hedged(call, hedge_after, acquire=None):
+    """
+    Run 'call()', and after 'hedge_after' seconds race it against a second 'call()'.
+    """
+
+    first = asyncio.ensure_future(call())
+    pending = {first}
+    try:
+        done, _ = await asyncio.wait(pending, timeout=hedge_after)
+        if done:
+            return first.result()
+
+        if acquire is not None:
+            await acquire()  # The duplicate is one more request to the provider
+        pending.add(asyncio.ensure_future(call()))
+        error = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        # Also reached when the caller is cancelled, so no attempt outlives it
+        for task in pending:
+            task.cancel()
+
+
+async def call_with_retry(call, policy, breaker=None, acquire=None):
+    """
+    Run an async call with retries, backoff, deadlines, hedging and a circuit breaker.
+
+    Args:
+        call (Callable[[], Awaitable]): Creates a fresh attempt each time it is called.
+        policy (RetryPolicy): Retry settings.
+        breaker (CircuitBreaker | None): Shared breaker for the provider.
+        acquire (Callable[[], Awaitable] | None): Awaited before every request that goes
+            out, retries and hedged duplicates included, e.g. a rate limiter. The wait
+            before an attempt does not count against its timeout.
+
+    Returns:
+        Any: The result of the first successful attempt.
+
+    Raises:
+        CircuitOpenError: If the breaker is open.
+        Exception: The last error if it is not retryable or the attempts/deadline run out.
+    """
+
+    started = time.monotonic()
+    for attempt in range(policy.max_attempts):
+        trial = breaker is not None and breaker.before_call()
+        try:
+            if acquire is not None:
+                await acquire()
+
+            timeout = policy.attempt_timeout
+            if policy.deadline is not None:
+                remaining = policy.deadline - (time.monotonic() - started)
+                timeout = remaining if timeout is None else min(timeout, remaining)
+
+            attempt_call = (lambda: _hedged(call, policy.hedge_after, acquire)) if policy.hedge_after else call
+            result = await asyncio.wait_for(attempt_call(), timeout)
+        except Exception as e:
+            if not is_retryable(e):
+                if breaker is not None:
+                    breaker.record_success()  # The provider answered; the request itself was bad
+                raise
+            if breaker is not None:
+                breaker.record_failure()
+
+            delay = retry_after(e)
+            delay = policy.backoff(attempt) if delay is None else delay
+            out_of_time = policy.deadline is not None and time.monotonic() - started + delay >= policy.deadline
+            if attempt == policy.max_attempts - 1 or out_of_time:
+                raise
+            await asyncio.sleep(delay)
+        except BaseException:
+            # Cancelled by a deadline, a disconnect or a winning hedge; neither a success nor a failure
+            if trial:
+                breaker.release_trial()
+            raise
+        else:
+            if breaker is not None:
+                breaker.record_success()
+            return result
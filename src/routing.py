@@ -0,0 +1,158 @@
+from collections import deque
+import statistics
+import time
+
+
+class Rule:
+    """
+    Routes matching LLM calls to a model.
+
+    A rule matches a call of the given kind ("planner" for ReAct turns,
+    "llm_knowledge" for the tool), up to an iteration and a number of format
+    failures in the run. Unset limits match everything.
+    """
+
+    def __init__(self, model, kind=None, max_iteration=None, max_reprompts=None):
+        """
+        Args:
+            model (str): The model to use.
+            kind (str | None): "planner", "llm_knowledge", or None for both.
+            max_iteration (int | None): Last ReAct iteration the rule applies to.
+            max_reprompts (int | None): Format failures after which the rule stops
+                applying, e.g. 0 to escalate to the next model after the first one.
+        """
+
+        self.model = model
+        self.kind = kind
+        self.max_iteration = max_iteration
+        self.max_reprompts = max_reprompts
+
+    def matches(self, kind, iteration=None, reprompts=0):
+        return ((self.kind is None or self.kind == kind)
+                and (self.max_iteration is None or iteration is None or iteration <= self.max_iteration)
+                and (self.max_reprompts is None or reprompts <= self.max_reprompts))
+
+
+class ModelRouter:
+    """
+    Picks the model for every LLM call from rules and measured health.
+
+    Rules are tried in order and the first matching rule whose model is healthy
+    wins, falling back to 'default'. A model is unhealthy once its rolling success
+    rate drops below 'min_success_rate' or its rolling median latency goes above
+    'max_p50_s'. Failed calls and replies in the wrong format both count as
+    failures. One router can be shared by every session of an agent.
+
+    Samples expire after 'max_age_s'. An unhealthy model gets no calls, so its
+    samples only age out; once fewer than 'min_samples' are left it is tried again.
+    """
+
+    def __init__(self, rules=(), default="gpt-4o", window=50, min_samples=5, min_success_rate=0.8, max_p50_s=None,
+                 max_age_s=300.0, clock=time.monotonic):
+        """
+        Args:
+            rules (Iterable[Rule]): Routing rules, first match wins.
+            default (str): Model used when no rule matches or no matching model is healthy.
+            window (int): Calls per model kept for the rolling latency and success rate.
+            min_samples (int): Calls needed before a model can be judged unhealthy.
+            min_success_rate (float): Lowest acceptable rolling success rate.
+            max_p50_s (float | None): Highest acceptable rolling median latency in seconds.
+            max_age_s (float): Seconds a sample counts for, so an unhealthy model recovers.
+            clock (Callable[[], float]): Time source, injectable for offline tests.
+        """
+
+        self.rules = list(rules)
+        self.default = default
+        self.window = window
+        self.min_samples = min_samples
+        self.min_success_rate = min_success_rate
+        self.max_p50_s = max_p50_s
+        self.max_age_s = max_age_s
+        self.clock = clock
+        self._samples = {}  # model -> deque of [recorded_at, latency_s | None, ok], oldest first
+
+    @classmethod
+    def small_first(cls, small="gpt-4o-mini", large="gpt-4o", early_steps=2, **options):
+        """
+        Small model for 'llm_knowledge' and the first 'early_steps' ReAct turns, large
+        model for later turns and for the rest of a run after a format failure.
+        """
+
+        return cls(rules=[Rule(small, kind="llm_knowledge"),
+                          Rule(small, kind="planner", max_iteration=early_steps, max_reprompts=0)],
+                   default=large, **options)
+
+    def choose(self, kind, iteration=None, reprompts=0):
+        """
+        Pick the model for one call.
+
+        Args:
+            kind (str): "planner" or "llm_knowledge".
+            iteration (int | None): The ReAct iteration of the call.
+            reprompts (int): Format failures so far in the run.
+
+        Returns:
+            str: The model name.
+        """
+
+        for rule in self.rules:
+            if rule.matches(kind, iteration, reprompts) and self.healthy(rule.model):
+                return rule.model
+        return self.default
+
+    def record(self, model, latency_s, ok):
+        """
+        Record the outcome of one call. 'latency_s' may be None (e.g. for a format failure).
+        """
+
+        samples = self._samples.get(model)
+        if samples is None:
+            samples = self._samples[model] = deque(maxlen=self.window)
+        samples.append([self.clock(), latency_s, ok])
+
+    def reject(self, model):
+        """
+        Turn the latest successful call of a model into a failure, for a reply that
+        arrived but was in the wrong format. The call then counts once, not twice.
+        """
+
+        for sample in reversed(self._samples.get(model, ())):
+            if sample[2]:
+                sample[1], sample[2] = None, False
+                return
+        self.record(model, None, ok=False)
+
+    def _recent(self, model):
+        samples = self._samples.get(model, ())
+        expired = self.clock() - self.max_age_s
+        while samples and samples[0][0] <= expired:
+            samples.popleft()
+        return samples
+
+    def healthy(self, model):
+        samples = self._recent(model)
+        if len(samples) < self.min_samples:
+            return True
+        health = self.model_stats(model)
+        if health["success_rate"] < self.min_success_rate:
+            return False
+        return self.max_p50_s is None or health["p50_s"] is None or health["p50_s"] <= self.max_p50_s
+
+    def model_stats(self, model):
+        """
+        Rolling health of one model.
+
+        Returns:
+            dict: "calls" in the window, "success_rate" and "p50_s" (None without timed calls).
+        """
+
+        samples = self._recent(model)
+        latencies = [latency for _, latency, ok in samples if latency is not None and ok]
+        return {
+            "calls": len(samples),
+            "success_rate": sum(ok for _, _, ok in samples) / len(samples) if samples else 1.0,
+            "p50_s": statistics.median(latencies) if latencies else None
+        }
+
+    def stats(self):
+        return {model: self.model_stats(model) for model in self._samples}
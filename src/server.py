@@ -0,0 +1,446 @@
+from agent import Agent
+from budget import CancelToken, RunBudget
+from cache import AnswerCache, SearchCache
+from sessions import SessionLog
+from ranking import PassageRanker
+from routing import ModelRouter
+from history import HistoryManager
+from ratelimit import RateLimiter
+from tracing import log, set_console_output
+
+from dotenv import load_dotenv
+from bisect import bisect_left
+import argparse
+import asyncio
+import json
+import time
+
+
+# Upper bounds in seconds of the latency histogram buckets
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+# Largest accepted request body
+MAX_BODY_BYTES = 1 << 20
+
+STATUS_TEXT = {
+    200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 409: "Conflict",
+    413: "Payload Too Large", 500: "Internal Server Error", 503: "Service Unavailable"
+}
+
+
+class Histogram:
+    """
+    Cumulative latency histogram in the Prometheus exposition format.
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # Last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def render(self, name, description):
+        lines = [f"# HELP {name} {description}", f"# TYPE {name} histogram"]
+        cumulative = 0
+        for bound, count in zip((*self.buckets, "+Inf"), self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{le="{bound}"}} {cumulative}')
+        lines += [f"{name}_sum {self.sum:.6f}", f"{name}_count {self.count}"]
+        return lines
+
+
+class AgentServer:
+    """
+    HTTP front end that runs agent sessions and streams their steps as server-sent events.
+
+    'POST /v1/sessions' with {"question": ...} starts a session and streams one event
+    per thought, action and observation (see 'step_events'), then a "final_answer"
+    (or "error") event. With "stream": false the final event is returned as JSON.
+    Optional fields: "session_id", "resume" (continue a checkpointed session),
+    "max_iterations", "max_tokens" and "deadline_s". A new run under a session id
+    that already has a log gets 409, resuming one that has none gets 404.
+
+    Every session runs on this event loop through one 'Agent', so all of them share
+    its keep-alive connection pools, rate limiter, caches and circuit breakers. At
+    most 'max_concurrency' sessions run at once and up to 'max_queue' more wait for a
+    slot. Beyond that, or after waiting 'queue_timeout' seconds, a request is shed
+    with 503 and Retry-After. A client that disconnects cancels its session.
+
+    'GET /metrics' reports in-flight sessions, queue depth, outcome counters, token
+    usage and latency histograms in the Prometheus text format; 'GET /health' is a
+    liveness check.
+    """
+
+    def __init__(self, agent, max_concurrency=16, max_queue=64, queue_timeout=10.0, keepalive_s=15.0):
+        """
+        Args:
+            agent (Agent): The agent every session runs on.
+            max_concurrency (int): Sessions running at once.
+            max_queue (int): Requests waiting for a slot before new ones are shed.
+            queue_timeout (float): Longest wait for a slot in seconds.
+            keepalive_s (float): Idle seconds between SSE keep-alive comments.
+        """
+
+        self.agent = agent
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.keepalive_s = keepalive_s
+
+        self.in_flight = 0
+        self.queued = 0
+        self.outcomes = {"ok": 0, "stopped": 0, "error": 0, "cancelled": 0, "shed": 0}
+        self.session_seconds = Histogram()
+        self.queue_wait_seconds = Histogram()
+        self.first_event_seconds = Histogram()
+
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self._server = None
+        self._connections = set()
+        self._cancel_tokens = set()
+
+    @property
+    def url(self):
+        host, port = self._server.sockets[0].getsockname()[:2]
+        return f"http://{host}:{port}"
+
+    async def start(self, host="127.0.0.1", port=0):
+        """
+        Start listening. Port 0 picks a free port; read it back from 'url'.
+        """
+
+        self.agent.build_clients()
+        self._server = await asyncio.start_server(self._handle_connection, host, port, backlog=1024)
+        return self
+
+    async def aclose(self):
+        """
+        Stop accepting connections, cancel the running sessions and close every connection.
+        """
+
+        if self._server is None:
+            return
+        self._server.close()
+        for token in list(self._cancel_tokens):
+            token.cancel("server shutdown")
+        for task in list(self._connections):
+            task.cancel()
+        await asyncio.gather(*self._connections, return_exceptions=True)
+        await self._server.wait_closed()
+        self._server = None
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    # ---------------------  HTTP  ---------------------
+
+    async def _handle_connection(self, reader, writer):
+        task = asyncio.current_task()
+        self._connections.add(task)
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                headers = {}
+                while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                try:
+                    method, path, _ = request_line.decode("latin-1").split(" ", 2)
+                    length = int(headers.get("content-length", 0))
+                    if length < 0:
+                        raise ValueError(length)
+                except ValueError:
+                    # The request cannot be framed, so the connection cannot be reused either
+                    await self._send_json(writer, 400, {"error": "malformed request line or Content-Length"})
+                    break
+                if length > MAX_BODY_BYTES:
+                    await self._send_json(writer, 413, {"error": f"body over {MAX_BODY_BYTES} bytes"})
+                    break
+                body = await reader.readexactly(length)
+
+                keep_alive = await self._handle_request(method, path.split("?")[0], body, writer)
+                if not keep_alive or headers.get("connection", "").lower() == "close":
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.CancelledError):
+            pass  # Client went away, or the server is shutting down
+        finally:
+            self._connections.discard(task)
+            writer.close()
+
+    def _write_head(self, writer, status, headers):
+        lines = [f"HTTP/1.1 {status} {STATUS_TEXT.get(status, 'Error')}"]
+        lines += [f"{name}: {value}" for name, value in headers.items()]
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+
+    async def _send(self, writer, status, body, content_type, headers=None):
+        self._write_head(writer, status, {"Content-Type": content_type, "Content-Length": len(body), **(headers or {})})
+        writer.write(body)
+        await writer.drain()
+        return True
+
+    async def _send_json(self, writer, status, payload, headers=None):
+        return await self._send(writer, status, json.dumps(payload, ensure_ascii=False).encode("utf-8"),
+                                "application/json", headers)
+
+    async def _send_chunk(self, writer, text):
+        data = text.encode("utf-8")
+        writer.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        await writer.drain()
+
+    # ---------------------  Routes  ---------------------
+
+    async def _handle_request(self, method, path, body, writer):
+        """
+        Serve one request. Returns whether the connection can be kept alive.
+        """
+
+        if path == "/health":
+            return await self._send_json(writer, 200, {"status": "ok", "in_flight": self.in_flight, "queued": self.queued})
+        if path == "/metrics":
+            return await self._send(writer, 200, self.render_metrics().encode("utf-8"),
+                                    "text/plain; version=0.0.4")
+        if path != "/v1/sessions":
+            return await self._send_json(writer, 404, {"error": f"no route for {method} {path}"})
+        if method != "POST":
+            return await self._send_json(writer, 405, {"error": "use POST"}, {"Allow": "POST"})
+
+        try:
+            request = json.loads(body or b"{}")
+            if not isinstance(request, dict):
+                raise ValueError("the body must be a JSON object")
+            if request.get("resume"):
+                if not request.get("session_id"):
+                    raise ValueError("'resume' needs a 'session_id'")
+            elif not isinstance(request.get("question"), str) or not request["question"].strip():
+                raise ValueError("'question' must be a non-empty string")
+            budget = self._budget(request)
+            session_id = request.get("session_id")
+            # A new run must not write into an existing session log (also rejects invalid ids)
+            exists = session_id is not None and self.agent.sessions is not None and self.agent.sessions.exists(session_id)
+            conflict = exists and not request.get("resume")
+        except (ValueError, TypeError) as e:
+            return await self._send_json(writer, 400, {"error": str(e)})
+        if request.get("resume") and not exists:
+            reason = "the server has no session log (see --sessions)" if self.agent.sessions is None else "no such session"
+            return await self._send_json(writer, 404, {"error": f"cannot resume '{session_id}': {reason}"})
+        if conflict:
+            return await self._send_json(writer, 409, {"error": f"session '{session_id}' already exists, "
+                                                                "send \"resume\": true to continue it"})
+
+        # ---------------------  Admission and load shedding  ---------------------
+        if self._slots.locked() and self.queued >= self.max_queue:
+            return await self._shed(writer, "queue full")
+        self.queued += 1
+        waited = time.perf_counter()
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.queue_timeout)
+        except TimeoutError:
+            return await self._shed(writer, f"no free slot after {self.queue_timeout:g} s")
+        finally:
+            self.queued -= 1
+        self.queue_wait_seconds.observe(time.perf_counter() - waited)
+
+        self.in_flight += 1
+        try:
+            return await self._session(request, budget, writer)
+        finally:
+            self.in_flight -= 1
+            self._slots.release()
+
+    def _budget(self, request):
+        # Per-request limits on top of the agent's default budget
+        limits = {key: request[key] for key in ("max_iterations", "max_tokens", "deadline_s") if key in request}
+        if not limits:
+            return None
+        default = self.agent.budget
+        for key, value in limits.items():
+            if value is not None and (not isinstance(value, (int, float)) or isinstance(value, bool) or value <= 0):
+                raise ValueError(f"'{key}' must be a positive number")
+        return RunBudget(**{"max_iterations": default.max_iterations, "max_tokens": default.max_tokens,
+                            "deadline_s": default.deadline_s, **limits},
+                         finalize=default.finalize, finalize_timeout_s=default.finalize_timeout_s)
+
+    async def _shed(self, writer, reason):
+        self.outcomes["shed"] += 1
+        return await self._send_json(writer, 503, {"error": f"overloaded: {reason}"}, {"Retry-After": 1})
+
+    async def _session(self, request, budget, writer):
+        """
+        Run one session, streaming its events as SSE (or returning the final event as JSON).
+        """
+
+        started = time.perf_counter()
+        events = asyncio.Queue()
+        cancel_token = CancelToken()
+        self._cancel_tokens.add(cancel_token)
+        task = asyncio.create_task(self._run(request, budget, cancel_token, events.put_nowait))
+
+        try:
+            if not request.get("stream", True):
+                final = await self._final_event(task, events)
+                return await self._send_json(writer, 500 if final["event"] == "error" else 200, final)
+
+            self._write_head(writer, 200, {"Content-Type": "text/event-stream", "Cache-Control": "no-cache",
+                                           "Transfer-Encoding": "chunked"})
+            first = True
+            while True:
+                try:
+                    event = await asyncio.wait_for(events.get(), self.keepalive_s)
+                except TimeoutError:
+                    await self._send_chunk(writer, ": keep-alive\n\n")
+                    continue
+                if event is None:
+                    break
+                if first:
+                    self.first_event_seconds.observe(time.perf_counter() - started)
+                    first = False
+                await self._send_chunk(writer, f"event: {event['event']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n")
+            writer.write(b"0\r\n\r\n")
+            await writer.drain()
+            return True
+        except (ConnectionError, asyncio.CancelledError):
+            # The client is gone: stop the session cleanly rather than finish it for nobody
+            cancel_token.cancel("client disconnected")
+            await asyncio.gather(task, return_exceptions=True)
+            raise
+        finally:
+            self._cancel_tokens.discard(cancel_token)
+            self.session_seconds.observe(time.perf_counter() - started)
+
+    async def _final_event(self, task, events):
+        await task
+        final = None
+        while not events.empty():
+            final = events.get_nowait() or final
+        return final
+
+    async def _run(self, request, budget, cancel_token, emit):
+        """
+        Run the agent for one request, emitting step events, then the final event and None.
+        """
+
+        try:
+            if request.get("resume"):
+                result = await self.agent.resume(request["session_id"], budget=budget, cancel_token=cancel_token,
+                                                 on_event=emit)
+            else:
+                result = await self.agent.run(request["question"], session_id=request.get("session_id"),
+                                              budget=budget, cancel_token=cancel_token, on_event=emit)
+        except Exception as e:
+            self.outcomes["error"] += 1
+            log(f"-- Session failed: {type(e).__name__}: {e} --")
+            emit({"event": "error", "error": f"{type(e).__name__}: {e}"})
+        else:
+            stopped = result["stopped"]
+            self.outcomes["ok" if stopped is None else "cancelled" if stopped == "cancelled" else "stopped"] += 1
+            emit({
+                "event": "final_answer",
+                "answer": result["answer"],
+                "iterations": result["iterations"],
+                "stopped": stopped,
+                "cached": result["cached"]["match"] if result["cached"] else None,
+                "session_id": result["session_id"],
+                "stats": result["stats"]
+            })
+        finally:
+            emit(None)
+
+    # ---------------------  Metrics  ---------------------
+
+    def render_metrics(self):
+        """
+        Render the server and agent metrics in the Prometheus text format.
+        """
+
+        lines = [
+            "# HELP react_sessions_in_flight Sessions currently running.",
+            "# TYPE react_sessions_in_flight gauge",
+            f"react_sessions_in_flight {self.in_flight}",
+            "# HELP react_queue_depth Requests waiting for a session slot.",
+            "# TYPE react_queue_depth gauge",
+            f"react_queue_depth {self.queued}",
+            "# HELP react_sessions_total Finished or rejected sessions by outcome.",
+            "# TYPE react_sessions_total counter",
+            *(f'react_sessions_total{{outcome="{outcome}"}} {count}' for outcome, count in self.outcomes.items()),
+        ]
+        for key, description in (("llm_calls", "LLM calls"), ("prompt_tokens", "Prompt tokens"),
+                                 ("completion_tokens", "Completion tokens"),
+                                 ("cached_tokens", "Prompt tokens served from the provider cache")):
+            lines += [f"# HELP react_{key}_total {description} of every session.",
+                      f"# TYPE react_{key}_total counter",
+                      f"react_{key}_total {self.agent.totals[key]}"]
+        lines += self.session_seconds.render("react_session_duration_seconds", "Session duration after admission.")
+        lines += self.queue_wait_seconds.render("react_queue_wait_seconds", "Time admitted sessions waited for a slot.")
+        lines += self.first_event_seconds.render("react_first_event_seconds", "Time to the first streamed event.")
+        return "\n".join(lines) + "\n"
+
+
+async def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the ReAct agent over HTTP, streaming steps as server-sent events.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--concurrency", type=int, default=16, help="sessions running at once (default: 16)")
+    parser.add_argument("--queue", type=int, default=64, help="requests waiting for a slot before shedding (default: 64)")
+    parser.add_argument("--queue-timeout", type=float, default=10.0, help="longest wait for a slot in seconds")
+    parser.add_argument("--rpm", type=float, default=None, help="LLM requests-per-minute limit")
+    parser.add_argument("--tpm", type=float, default=None, help="LLM tokens-per-minute limit")
+    parser.add_argument("--model", default="gpt-4o")
+    parser.add_argument("--small-model", help="route llm_knowledge and early turns to this model")
+    parser.add_argument("--action-mode", choices=["text", "tools"], default="text")
+    parser.add_argument("--max-iterations", type=int, default=25, help="default ReAct iterations per session")
+    parser.add_argument("--max-tokens", type=int, default=None, help="default prompt + completion tokens per session")
+    parser.add_argument("--deadline", type=float, default=None, help="default wall-clock seconds per session")
+    parser.add_argument("--history-budget", type=int, default=6000, help="prompt token budget per turn")
+    parser.add_argument("--rank-passages", action="store_true")
+    parser.add_argument("--answer-cache", help="SQLite file of final answers reused for repeated/paraphrased questions")
+    parser.add_argument("--sessions", help="checkpoint sessions to this directory (enables \"resume\")")
+    args = parser.parse_args(argv)
+
+    load_dotenv()
+    set_console_output(False)
+
+    search_cache = SearchCache(path="search_cache.sqlite3")
+    answer_cache = AnswerCache(path=args.answer_cache) if args.answer_cache else None
+    sessions = SessionLog(args.sessions) if args.sessions else None
+    agent = Agent(
+        model=args.model,
+        verbose=False,
+        action_mode=args.action_mode,
+        search_cache=search_cache,
+        history=HistoryManager(token_budget=args.history_budget),
+        rate_limiter=RateLimiter(requests_per_minute=args.rpm, tokens_per_minute=args.tpm),
+        max_connections=max(args.concurrency * 2, 10),
+        sessions=sessions,
+        passage_ranker=PassageRanker() if args.rank_passages else None,
+        answer_cache=answer_cache,
+        router=ModelRouter.small_first(small=args.small_model, large=args.model) if args.small_model else None,
+        budget=RunBudget(max_iterations=args.max_iterations, max_tokens=args.max_tokens, deadline_s=args.deadline)
+    )
+    server = AgentServer(agent, max_concurrency=args.concurrency, max_queue=args.queue,
+                         queue_timeout=args.queue_timeout)
+    await server.start(args.host, args.port)
+    try:
+        print(f"Serving on {server.url}  (POST /v1/sessions, GET /metrics)")
+        await asyncio.Event().wait()
+    finally:
+        await server.aclose()
+        await agent.aclose()
+        search_cache.close()
+        if answer_cache is not None:
+            answer_cache.close()
+        if sessions is not None:
+            await sessions.aclose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
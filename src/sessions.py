@@ -0,0 +1,271 @@
+import asyncio
+import struct
+import uuid
+import json
+import zlib
+import os
+
+
+# Record header: payload length, CRC-32 of the payload, codec of the payload
+HEADER = struct.Struct(">IIB")
+
+CODEC_RAW, CODEC_ZLIB, CODEC_ZSTD = 0, 1, 2
+CODECS = {None: CODEC_RAW, "zlib": CODEC_ZLIB, "zstd": CODEC_ZSTD}
+
+
+def new_session_id():
+    return uuid.uuid4().hex
+
+
+def _zstd():
+    try:
+        import zstandard
+    except ImportError:
+        raise ImportError("compress='zstd' needs the 'zstandard' package (pip install zstandard)") from None
+    return zstandard
+
+
+def encode_record(record, compress=None, min_compress_bytes=256):
+    """
+    Encode one record as a length-prefixed, checksummed JSON payload.
+
+    Payloads shorter than 'min_compress_bytes' are stored raw, since compressing
+    them would not pay off.
+
+    Args:
+        record (dict): The record to encode.
+        compress (str | None): None, "zlib" or "zstd".
+        min_compress_bytes (int): Smallest payload worth compressing.
+
+    Returns:
+        bytes: Header plus payload.
+    """
+
+    payload = json.dumps(record, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    codec = CODECS[compress] if len(payload) >= min_compress_bytes else CODEC_RAW
+    if codec == CODEC_ZLIB:
+        payload = zlib.compress(payload)
+    elif codec == CODEC_ZSTD:
+        payload = _zstd().ZstdCompressor().compress(payload)
+    return HEADER.pack(len(payload), zlib.crc32(payload), codec) + payload
+
+
+def decode_records(data):
+    """
+    Decode the records of a session log.
+
+    Decoding stops at the first incomplete or corrupt record: a crash mid-write
+    leaves at most one torn record at the end of the file.
+
+    Args:
+        data (bytes): The log contents.
+
+    Returns:
+        tuple[list[dict], int]: The records and the length of the valid prefix.
+    """
+
+    records, offset = [], 0
+    while offset + HEADER.size <= len(data):
+        length, crc, codec = HEADER.unpack_from(data, offset)
+        payload = data[offset + HEADER.size:offset + HEADER.size + length]
+        if len(payload) < length or zlib.crc32(payload) != crc:
+            break
+        if codec == CODEC_ZLIB:
+            payload = zlib.decompress(payload)
+        elif codec == CODEC_ZSTD:
+            payload = _zstd().ZstdDecompressor().decompress(payload)
+        records.append(json.loads(payload))
+        offset += HEADER.size + length
+    return records, offset
+
+
+class SessionLog:
+    """
+    Append-only, crash-safe store of agent sessions: one log file per session.
+
+    Appends go to the OS right away, so a crash of the process loses nothing that
+    was appended. 'sync()' makes them durable against power loss as well: fsyncs
+    are batched, so every session that asks within 'sync_interval' seconds shares
+    one round of fsync calls, run off the event loop.
+
+    Files are spread over 256 subdirectories by session id, and at most
+    'max_open_files' handles are kept open, so the store scales to millions of
+    sessions.
+    """
+
+    def __init__(self, root, compress=None, sync_interval=0.01, fsync=True, max_open_files=256):
+        """
+        Args:
+            root (str): Directory holding the session logs (created if missing).
+            compress (str | None): Per-record compression: None, "zlib" or "zstd"
+                (needs the 'zstandard' package).
+            sync_interval (float): How long a 'sync()' waits to gather other sessions'
+                writes into the same fsync batch.
+            fsync (bool): False skips fsync entirely (appends still survive a process crash).
+            max_open_files (int): Open file handles kept for active sessions.
+        """
+
+        if compress not in CODECS:
+            raise ValueError(f"Unknown compression '{compress}', expected one of {list(CODECS)}")
+        if compress == "zstd":
+            _zstd()
+
+        self.root = root
+        self.compress = compress
+        self.sync_interval = sync_interval
+        self.fsync = fsync
+        self.max_open_files = max_open_files
+        os.makedirs(root, exist_ok=True)
+
+        self._files = {}      # session_id -> open file, in least recently used order
+        self._dirty = {}      # session_id -> file with writes that are not fsynced yet
+        self._new_dirs = set()
+        self._batch = None    # The sync batch that is still gathering writes
+        self._fsync_lock = asyncio.Lock()
+
+    def path(self, session_id):
+        if not session_id or not all(c.isalnum() or c in "-_" for c in session_id):
+            raise ValueError(f"Invalid session id '{session_id}'")
+        return os.path.join(self.root, session_id[:2], f"{session_id}.log")
+
+    def exists(self, session_id):
+        return os.path.exists(self.path(session_id))
+
+    def read(self, session_id):
+        """
+        Read every complete record of a session.
+
+        Raises:
+            KeyError: If there is no log for 'session_id'.
+        """
+
+        try:
+            with open(self.path(session_id), "rb") as f:
+                return decode_records(f.read())[0]
+        except FileNotFoundError:
+            raise KeyError(f"No session log for '{session_id}'") from None
+
+    def append(self, session_id, record):
+        """
+        Append one record to a session's log and hand it to the OS.
+        """
+
+        f = self._open(session_id)
+        f.write(encode_record(record, self.compress))
+        f.flush()
+        self._dirty[session_id] = f
+
+    def _open(self, session_id):
+        f = self._files.pop(session_id, None)
+        if f is None:
+            path = self.path(session_id)
+            directory = os.path.dirname(path)
+            if not os.path.isdir(directory):
+                os.makedirs(directory, exist_ok=True)
+                self._new_dirs.add(self.root)
+            if not os.path.exists(path):
+                self._new_dirs.add(directory)
+            f = open(path, "ab")
+
+            # Cut off a torn record left by a crash, so new records follow valid ones
+            with open(path, "rb") as existing:
+                _, valid = decode_records(existing.read())
+            if valid < f.tell():
+                f.truncate(valid)
+
+            while len(self._files) >= self.max_open_files:
+                oldest, handle = next(iter(self._files.items()))
+                self._release(oldest, handle)
+        self._files[session_id] = f
+        return f
+
+    def _release(self, session_id, f):
+        # Always fsync: the file may be in a batch that is still in flight
+        del self._files[session_id]
+        self._dirty.pop(session_id, None)
+        if self.fsync:
+            os.fsync(f.fileno())
+        f.close()
+
+    def close_session(self, session_id):
+        """
+        Fsync and close the handle of a finished session.
+        """
+
+        f = self._files.get(session_id)
+        if f is not None:
+            self._release(session_id, f)
+
+    async def sync(self):
+        """
+        Wait until every record appended so far is fsynced.
+
+        Concurrent callers join the batch that is still gathering writes, so N
+        sessions finishing a step together cost one round of fsyncs, not N.
+        """
+
+        if not self.fsync:
+            return
+        if not (self._dirty or self._new_dirs):
+            if self._fsync_lock.locked():
+                async with self._fsync_lock:  # Our writes may be in the batch in flight
+                    pass
+            return
+        if self._batch is None:
+            self._batch = asyncio.ensure_future(self._sync_batch())
+        await asyncio.shield(self._batch)
+
+    async def _sync_batch(self):
+        await asyncio.sleep(self.sync_interval)
+
+        # Writes from here on belong to the next batch
+        self._batch = None
+        files, self._dirty = list(self._dirty.values()), {}
+        directories, self._new_dirs = self._new_dirs, set()
+
+        # Also waits for an earlier batch still in flight, which may hold writes of our callers
+        async with self._fsync_lock:
+            await asyncio.to_thread(_fsync_all, files, directories)
+
+    async def aclose(self):
+        await self.sync()
+        for session_id, f in list(self._files.items()):
+            self._release(session_id, f)
+
+
+def _fsync_all(files, directories):
+    for f in files:
+        try:
+            os.fsync(f.fileno())
+        except (ValueError, OSError):
+            pass  # Closed meanwhile, and fsynced on close
+    # New files are only durable once their directory entry is
+    for directory in directories:
+        fd = os.open(directory, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+
+class SessionHistory(list):
+    """
+    A chat history that writes every 'append' / 'extend' to a session log.
+
+    Each call becomes one record, so messages appended together (e.g. the tool
+    results of one turn) are restored together or not at all.
+    """
+
+    def __init__(self, log, session_id, messages=()):
+        super().__init__(messages)
+        self.log = log
+        self.session_id = session_id
+
+    def append(self, message):
+        super().append(message)
+        self.log.append(self.session_id, {"type": "messages", "messages": [message]})
+
+    def extend(self, messages):
+        messages = list(messages)
+        super().extend(messages)
+        self.log.append(self.session_id, {"type": "messages", "messages": messages})
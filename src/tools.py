@@ -1,107 +1,207 @@
-from utils import format_internet_results
+from utils import (
+    format_internet_results,
+    format_ranked_passages,
+    merge_search_results,
+    parse_operands,
+    parse_search_queries,
+    safe_eval_arithmetic)
+from cache import make_cache_key
+from registry import registry
+from tracing import log
 
+import asyncio
 
-# Available tools and their descriptions
-llm_tools = [
-    {
-        "name": "calculator_add",
-        "description": "Add two numbers a and b. Both should be int or float. This tool cannot accept more than 2 numbers at a time."
-    },
-    {
-        "name": "calculator_subtract",
-        "description": "Subtract b from a. Both should be int or float. This tool cannot accept more than 2 numbers at a time."
-    },
-    {
-        "name": "calculator_multiply",
-        "description": "Multiply two numbers a and b. Both should be int or float. This tool cannot accept more than 2 numbers at a time."
-    },
-    {
-        "name": "calculator_divide",
-        "description": "Divide a by b. Both should be int or float; b must not be zero. This tool cannot accept more than 2 numbers at a time."
-    },
-    {
-        "name": "llm_knowledge",
-        "description": (
-            "Use only for generating or retrieving *textual* content—"
-            "facts, explanations, jokes, etc. **Do NOT** perform any arithmetic "
-            "(adding, subtracting, multiplying, dividing)."
-        )
-    },
-    {
-        "name": "internet_search",
-        "description": (
-            "Search the internet for up-to-date, factual information. "
-            "Always provide a plain string query as the Action Input "
-            "(not a tuple). Use this tool whenever the answer requires "
-            "current events, recent facts, or information beyond the model's "
-            "built-in knowledge."
-        )
-    }
-]
 
-# List of all the tool names
-tools_str = [tool["name"] for tool in llm_tools]
+# Shared by the calculator descriptions: how to apply one operation to many values in one call
+BATCH_USAGE = (
+    " To apply the operation to many values at once, pass a list of pairs [(a1, b1), (a2, b2), ...],"
+    " a scalar with a list (a, [b1, b2, ...]) or ([a1, a2, ...], b), or two equal-length lists."
+)
+
+# Significant digits of 'calculator_eval'
+CALCULATOR_PRECISION = 28
+
+# JSON schema of a calculator operand: a number or a list of numbers (batch mode)
+NUMBER_OR_LIST = {"anyOf": [{"type": "number"}, {"type": "array", "items": {"type": "number"}}]}
+
+def _is_batch(a, b):
+    return isinstance(a, (list, tuple)) or isinstance(b, (list, tuple))
+
+
+def _render_number(value):
+    value = float(value)
+    if value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value)
+
+
+def _elementwise(op, a, b):
+    """
+    Apply a NumPy ufunc (by name, e.g. "add") to (broadcast) operand arrays.
+
+    NumPy is imported on first use so scalar-only runs never pay for it.
+
+    Returns:
+        tuple[numpy.ndarray, numpy.ndarray, numpy.ndarray] | str: The result with both broadcast
+            operands, or an error message if the shapes are incompatible.
+    """
+
+    import numpy as np
+
+    try:
+        a, b = np.broadcast_arrays(np.asarray(a, dtype=float), np.asarray(b, dtype=float))
+    except ValueError:
+        return "Operand lists must have the same length (or one operand must be a single number)"
+    if a.ndim != 1:
+        a, b = a.reshape(-1), b.reshape(-1)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return getattr(np, op)(a, b), a, b
+
+
+def render_batch(values):
+    """
+    Render a batch result compactly, e.g. "[3, 7.5, Can't divide by Zero]".
+    """
+
+    return "[" + ", ".join(v if isinstance(v, str) else _render_number(v) for v in values) + "]"
+
+
+def _batch(op, a, b):
+    outcome = _elementwise(op, a, b)
+    if isinstance(outcome, str):
+        return outcome
+    return render_batch(outcome[0])
+
+
+def _reduce(op, values):
+    # A flat series, e.g. calculator_add([1, 2, 3, 4]) -> 10
+    import numpy as np
+
+    return _render_number(getattr(np, op).reduce(np.asarray(values, dtype=float)))
+
 
-def calculator_add(a, b):
+@registry.tool(
+    description="Add two numbers a and b. Both should be int or float." + BATCH_USAGE + " A flat list [x1, x2, x3, ...] returns its sum.",
+    parameters={
+        "a": {**NUMBER_OR_LIST, "description": "First addend, a list of addends, or (without b) the series to sum."},
+        "b": {**NUMBER_OR_LIST, "description": "Second addend or a list of addends."}
+    },
+    parse_text=parse_operands
+)
+def calculator_add(a, b=None):
     """
-    Add two numbers.
+    Add two numbers, element-wise batches, or a whole series.
 
     Args:
-        a (int | float): The first addend.
-        b (int | float): The second addend.
+        a (int | float | list): The first addend, a list of addends, or (when b is None)
+            the series to sum.
+        b (int | float | list | None): The second addend or a list of addends.
 
     Returns:
-        int | float: The sum of a and b.
+        int | float | str: The sum of a and b, or for batches a compact rendering of every result.
     """
-    print("     >> Invoking calculator_add")
+    log("     >> Invoking calculator_add")
+
+    if b is None:
+        return _reduce("add", a)
+    if _is_batch(a, b):
+        return _batch("add", a, b)
 
     return a + b
 
 
-def calculator_subtract(a, b):
+@registry.tool(
+    description="Subtract b from a. Both should be int or float." + BATCH_USAGE,
+    parameters={
+        "a": {**NUMBER_OR_LIST, "description": "Minuend or a list of minuends."},
+        "b": {**NUMBER_OR_LIST, "description": "Subtrahend or a list of subtrahends."}
+    },
+    required=["a", "b"],
+    parse_text=parse_operands
+)
+def calculator_subtract(a, b=None):
     """
-    Subtract b from a.
+    Subtract b from a (element-wise for batches).
 
     Args:
-        a (int | float): The minuend.
-        b (int | float): The subtrahend.
+        a (int | float | list): The minuend(s).
+        b (int | float | list): The subtrahend(s).
 
     Returns:
-        int | float: The difference a - b.
+        int | float | str: The difference a - b, or for batches a compact rendering of every result.
     """
-    print("     >> Invoking calculator_subtract")
+    log("     >> Invoking calculator_subtract")
+
+    if b is None:
+        return "calculator_subtract needs two operands: (a, b)"
+    if _is_batch(a, b):
+        return _batch("subtract", a, b)
 
     return a - b
 
 
-def calculator_multiply(a, b):
+@registry.tool(
+    description="Multiply two numbers a and b. Both should be int or float." + BATCH_USAGE + " A flat list [x1, x2, x3, ...] returns its product.",
+    parameters={
+        "a": {**NUMBER_OR_LIST, "description": "First factor, a list of factors, or (without b) the series to multiply."},
+        "b": {**NUMBER_OR_LIST, "description": "Second factor or a list of factors."}
+    },
+    parse_text=parse_operands
+)
+def calculator_multiply(a, b=None):
     """
-    Multiply two numbers.
+    Multiply two numbers, element-wise batches, or a whole series.
 
     Args:
-        a (int | float): The first factor.
-        b (int | float): The second factor.
+        a (int | float | list): The first factor, a list of factors, or (when b is None)
+            the series to multiply together.
+        b (int | float | list | None): The second factor or a list of factors.
 
     Returns:
-        int | float: The product of a and b.
+        int | float | str: The product of a and b, or for batches a compact rendering of every result.
     """
-    print("     >> Invoking calculator_multiply")
+    log("     >> Invoking calculator_multiply")
+
+    if b is None:
+        return _reduce("multiply", a)
+    if _is_batch(a, b):
+        return _batch("multiply", a, b)
 
     return a * b
 
 
-def calculator_divide(a, b):
+@registry.tool(
+    description="Divide a by b. Both should be int or float; b must not be zero." + BATCH_USAGE,
+    parameters={
+        "a": {**NUMBER_OR_LIST, "description": "Dividend or a list of dividends."},
+        "b": {**NUMBER_OR_LIST, "description": "Divisor or a list of divisors."}
+    },
+    required=["a", "b"],
+    parse_text=parse_operands
+)
+def calculator_divide(a, b=None):
     """
-    Divide a by b.
+    Divide a by b (element-wise for batches).
 
     Args:
-        a (int | float): The dividend.
-        b (int | float): The divisor. Must not be zero.
+        a (int | float | list): The dividend(s).
+        b (int | float | list): The divisor(s). Must not be zero.
 
     Returns:
-        float | str: The quotient a / b, or an error message if b is zero.
+        float | str: The quotient a / b, or an error message if b is zero. For batches,
+            a compact rendering where each zero divisor yields the error message in place.
     """
-    print("     >> Invoking calculator_divide")
+    log("     >> Invoking calculator_divide")
+
+    if b is None:
+        return "calculator_divide needs two operands: (a, b)"
+    if _is_batch(a, b):
+        outcome = _elementwise("divide", a, b)
+        if isinstance(outcome, str):
+            return outcome
+        quotients, _, divisors = outcome
+        return render_batch("Can't divide by Zero" if d == 0 else q for q, d in zip(quotients, divisors))
 
     if b == 0:
         return "Can't divide by Zero"
@@ -109,41 +209,167 @@ def calculator_divide(a, b):
     return a / b
 
 
-def llm_knowledge(client, input):
+@registry.tool(
+    description=(
+        "Evaluate a whole arithmetic expression in one step with Decimal precision. "
+        "Supports + - * / ** and parentheses, plus named intermediate variables "
+        "separated by ';' (e.g. \"F = 321.5 / 256.1; N = 15000000 * F; N\"). "
+        "Returns the value of the last statement. Only numbers and arithmetic are allowed."
+    ),
+    parameters={"expression": {"type": "string", "description": "The arithmetic expression, e.g. \"F = 321.5 / 256.1; N = 15000000 * F; N\"."}}
+)
+def calculator_eval(expression):
     """
-    Use GPT-4o for text generation without arithmetic.
+    Evaluate an arithmetic expression (with optional named variables) in one call.
+
+    Args:
+        expression (str): e.g. "F = 321.5 / 256.1; N = 15000000 * F; N".
+
+    Returns:
+        str: The result as a plain decimal string (scientific notation past the 28
+            significant digits), or an error message the model can act on.
     """
-    print("     >> Invoking llm_knowledge")
+    log("     >> Invoking calculator_eval")
+
+    # Tolerate a quoted expression, e.g. Action Input: "2 * (3 + 4)"
+    expression = expression.strip().strip("\"'")
+    try:
+        result = safe_eval_arithmetic(expression, precision=CALCULATOR_PRECISION)
+    except ZeroDivisionError:
+        return "Can't divide by Zero"
+    except ValueError as e:
+        return f"Invalid expression: {e}"
+
+    if result != result.to_integral_value():
+        return str(result)
+    # Whole numbers are written out in full only while every digit is significant
+    return format(result.normalize(), "f") if result.adjusted() < CALCULATOR_PRECISION else str(result.normalize())
 
-    completion = client.chat.completions.create(
-        model="gpt-4o",
+
+# Sampled at temperature 0.5, so not cacheable
+@registry.tool(
+    description=(
+        "Use only for generating or retrieving *textual* content—"
+        "facts, explanations, jokes, etc. **Do NOT** perform any arithmetic "
+        "(adding, subtracting, multiplying, dividing)."
+    ),
+    parameters={"prompt": {"type": "string", "description": "The text request. No arithmetic."}},
+    backend="llm"
+)
+async def llm_knowledge(client, prompt, model="gpt-4o"):
+    """
+    Use GPT-4o (or the model picked by the router) for text generation without arithmetic.
+    """
+    log("     >> Invoking llm_knowledge")
+
+    completion = await client.chat.completions.create(
+        model=model,
         temperature=0.5,
         messages=[
             {"role": "system", "content": "Answer the question but do not **ever** perform any arithmetic."},
-            {"role": "user", "content": input}
+            {"role": "user", "content": prompt}
         ]
     )
 
     return completion.choices[0].message.content
 
 
-def internet_search(client, input):
+# Fixed Tavily parameters for every search (part of the cache key)
+SEARCH_PARAMS = {
+    "max_results": 3,
+    "search_depth": "basic",
+    "include_images": False,
+    "include_image_descriptions": False,
+    "include_answer": False,
+    "include_raw_content": False
+}
+
+
+# Upper bound on the merged results of a multi-query search
+MAX_MERGED_RESULTS = 6
+
+
+# Caches its own results (see 'cache'), keyed on the search and ranking settings too
+@registry.tool(
+    description=(
+        "Search the internet for up-to-date, factual information. "
+        "Provide a plain string query as the Action Input (not a tuple), "
+        "or a list of up to 5 query strings to run in parallel, e.g. "
+        "reformulations or separate parts of a compound question; their "
+        "results come back merged, ranked and de-duplicated. Use this tool "
+        "whenever the answer requires current events, recent facts, or "
+        "information beyond the model's built-in knowledge."
+    ),
+    parameters={"query": {
+        "anyOf": [{"type": "string"}, {"type": "array", "items": {"type": "string"}, "maxItems": 5}],
+        "description": "A plain string search query, or a list of queries to search in parallel."
+    }},
+    backend="search"
+)
+async def internet_search(client, query, cache=None, ranker=None):
     """
     Use Tavily to search the internet.
+
+    'query' is one query or a list of queries (see 'parse_search_queries'). Several
+    queries are searched concurrently and their results merged into one ranked,
+    de-duplicated list (see 'merge_search_results'), so one action replaces a run of
+    sequential reformulated searches.
+
+    If a 'SearchCache' is given, the formatted results are cached under the
+    normalized query plus the search parameters, so repeated queries skip Tavily.
+
+    If a 'PassageRanker' is given, the full page text of each result is fetched and
+    only the passages most relevant to the query are returned, within its token
+    budget, instead of the first 600 characters of every result.
     """
-    print("     >> Invoking internet_search")
+    log("     >> Invoking internet_search")
 
-    response = client.search(
-        query=input,
-        max_results=3,
-        search_depth="basic",
-        include_images=False,
-        include_image_descriptions=False,
-        include_answer=False,
-        include_raw_content=False
-    )
+    queries = parse_search_queries(query)
+    params = SEARCH_PARAMS if ranker is None else {**SEARCH_PARAMS, **ranker.search_params}
+
+    key = None
+    if cache is not None:
+        cache_query = queries[0] if len(queries) == 1 else sorted(q.lower() for q in queries)
+        key = make_cache_key(cache_query, params if ranker is None else {**params, "ranker": ranker.settings})
+        cached = cache.get(key)
+        if cached is not None:
+            log("     >> internet_search cache hit")
+            return cached
+
+    if len(queries) == 1:
+        response = await client.search(query=queries[0], **params)
+        results, duplicates, failed = response.get("results", []), 0, []
+    else:
+        log(f"     >> internet_search fan-out over {len(queries)} queries")
+        responses = await asyncio.gather(*(client.search(query=q, **params) for q in queries),
+                                         return_exceptions=True)
+        failed = [r for r in responses if isinstance(r, BaseException)]
+        if len(failed) == len(responses):
+            raise failed[0]  # Nothing to show: let the caller's retry policy handle it
+        results, duplicates = merge_search_results(
+            [r.get("results", []) for r in responses if not isinstance(r, BaseException)],
+            max_items=MAX_MERGED_RESULTS
+        )
+
+    if ranker is None:
+        formatted = format_internet_results(results, header="\n-- Internet Search Results --",
+                                            max_items=3 if len(queries) == 1 else MAX_MERGED_RESULTS,
+                                            snippet_chars=600, queries=queries, duplicates=duplicates)
+    else:
+        formatted = format_ranked_passages(ranker.select(" ".join(queries), results), results,
+                                           queries=queries, duplicates=duplicates)
+
+    if failed:
+        formatted += f"\n\nNote: {len(failed)} of {len(queries)} queries failed and were skipped."
+        return formatted  # Not cached, so the failed queries are retried next time
+
+    if cache is not None:
+        cache.set(key, formatted)
+    return formatted
 
-    results = response.get("results", [])
 
-    formatted = format_internet_results(results, header="\n-- Internet Search Results --", max_items=3, snippet_chars=600)
-    return formatted
\ No newline at end of file
+# Generated from the registry: tool specs for the prompt, tool names and
+# OpenAI function-calling schemas of the built-in tools
+llm_tools = registry.specs
+tools_str = registry.names
+tool_schemas = registry.schemas
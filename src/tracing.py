@@ -0,0 +1,215 @@
+import asyncio
+import json
+import time
+import os
+
+
+# ---------------------  Console output  ---------------------
+
+console_enabled = True
+
+
+def set_console_output(enabled):
+    """
+    Turn the human-readable progress prints on or off for the whole process.
+    """
+
+    global console_enabled
+    console_enabled = enabled
+
+
+def log(*args, **kwargs):
+    """
+    Drop-in replacement for 'print' that is a no-op when console output is off.
+    """
+
+    if console_enabled:
+        print(*args, **kwargs)
+
+
+# ---------------------  Spans  ---------------------
+
+class Span:
+    """
+    A timed unit of work (a run, or one ReAct iteration) with free-form attributes.
+    """
+
+    def __init__(self, tracer, name, trace_id, parent_id=None, attributes=None):
+        self.tracer = tracer
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.attributes = dict(attributes or {})
+        self.start_time = time.time()
+        self.end_time = None
+        self._started = time.perf_counter()
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def end(self):
+        if self.end_time is not None:
+            return
+        self.end_time = self.start_time + (time.perf_counter() - self._started)
+        self.tracer._export(self)
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start_time": self.start_time,
+            "duration_s": self.end_time - self.start_time,
+            "attributes": self.attributes
+        }
+
+
+class NullSpan:
+    """
+    Span used when tracing is off; every call is a no-op.
+    """
+
+    span_id = None
+
+    def set(self, **attributes):
+        pass
+
+    def end(self):
+        pass
+
+
+NULL_SPAN = NullSpan()
+
+
+class Tracer:
+    """
+    Creates spans and hands finished ones to every exporter.
+    """
+
+    def __init__(self, exporters):
+        """
+        Args:
+            exporters (list): Objects with 'export(span)' and optionally 'async aclose()'.
+        """
+
+        self.exporters = list(exporters)
+
+    def start_span(self, name, parent=None, **attributes):
+        """
+        Start a span. A span without a parent starts a new trace.
+        """
+
+        if parent is None or parent.span_id is None:
+            return Span(self, name, os.urandom(16).hex(), attributes=attributes)
+        return Span(self, name, parent.trace_id, parent.span_id, attributes)
+
+    def _export(self, span):
+        for exporter in self.exporters:
+            exporter.export(span)
+
+    async def aclose(self):
+        """
+        Flush and close every exporter.
+        """
+
+        for exporter in self.exporters:
+            if hasattr(exporter, "aclose"):
+                await exporter.aclose()
+
+
+# ---------------------  Exporters  ---------------------
+
+class JsonlExporter:
+    """
+    Appends one JSON line per finished span to a file.
+    """
+
+    def __init__(self, path):
+        self._file = open(path, "a", encoding="utf-8")
+
+    def export(self, span):
+        self._file.write(json.dumps(span.to_dict(), default=str) + "\n")
+        self._file.flush()
+
+    async def aclose(self):
+        self._file.close()
+
+
+def _otlp_value(value):
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    if isinstance(value, str):
+        return {"stringValue": value}
+    return {"stringValue": json.dumps(value, default=str)}
+
+
+class OtlpHttpExporter:
+    """
+    Sends spans to an OpenTelemetry collector over OTLP/HTTP (JSON encoding).
+
+    Spans are buffered and posted in batches from the running event loop, so
+    exporting never blocks the ReAct loop. Only 'httpx' is needed, not the
+    OpenTelemetry SDK.
+    """
+
+    def __init__(self, endpoint="http://localhost:4318/v1/traces", service_name="react-agent", batch_size=64):
+        import httpx
+
+        self.endpoint = endpoint
+        self.service_name = service_name
+        self.batch_size = batch_size
+        self._buffer = []
+        self._http = httpx.AsyncClient(timeout=5.0)
+        self._pending = set()
+
+    def export(self, span):
+        self._buffer.append(span)
+        if len(self._buffer) >= self.batch_size:
+            task = asyncio.get_running_loop().create_task(self.flush())
+            self._pending.add(task)
+            task.add_done_callback(self._pending.discard)
+
+    def _payload(self, spans):
+        return {"resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": self.service_name}}]},
+            "scopeSpans": [{
+                "scope": {"name": "react-agent"},
+                "spans": [{
+                    "traceId": s.trace_id,
+                    "spanId": s.span_id,
+                    **({"parentSpanId": s.parent_id} if s.parent_id else {}),
+                    "name": s.name,
+                    "kind": 1,
+                    "startTimeUnixNano": str(int(s.start_time * 1e9)),
+                    "endTimeUnixNano": str(int(s.end_time * 1e9)),
+                    "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in s.attributes.items()]
+                } for s in spans]
+            }]
+        }]}
+
+    async def flush(self):
+        """
+        Post every buffered span. Export failures are reported but never raised,
+        so a missing collector cannot break a run.
+        """
+
+        spans, self._buffer = self._buffer, []
+        if not spans:
+            return
+        try:
+            response = await self._http.post(self.endpoint, json=self._payload(spans))
+            response.raise_for_status()
+        except Exception as e:
+            log(f"-- OTLP export of {len(spans)} span(s) failed: {e} --")
+
+    async def aclose(self):
+        if self._pending:
+            await asyncio.gather(*self._pending)
+        await self.flush()
+        await self._http.aclose()
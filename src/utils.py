@@ -1,4 +1,7 @@
+from decimal import Decimal, DivisionByZero, InvalidOperation, localcontext
 from urllib.parse import urlparse
+from registry import registry
+from tracing import log
 import textwrap
 import ast
 import re
@@ -47,10 +50,99 @@ def domain(url):
         return url or ""
 
 
+def canonical_url(url):
+    """
+    Reduce a URL to a key that treats trivially different links as the same page.
+
+    The scheme, a leading "www.", the fragment, tracking parameters ("utm_*") and a
+    trailing slash are dropped, and the host is lowercased, e.g.
+    'https://www.Example.com/a/?utm_source=x#top' -> 'example.com/a'.
+
+    Args:
+        url: A URL string (may be empty or malformed).
+
+    Returns:
+        The canonical key (the original string if it cannot be parsed).
+    """
+
+    try:
+        parts = urlparse(url)
+    except Exception:
+        return url or ""
+    host = parts.netloc.lower().removeprefix("www.")
+    query = "&".join(p for p in parts.query.split("&") if p and not p.startswith("utm_"))
+    return host + parts.path.rstrip("/") + (f"?{query}" if query else "")
+
+
+def shingles(text, size=3):
+    """
+    Set of overlapping word n-grams of a text, for near-duplicate detection.
+    """
+
+    words = re.findall(r"\w+", (text or "").lower())
+    if len(words) <= size:
+        return {tuple(words)} if words else set()
+    return {tuple(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def merge_search_results(result_lists, max_items=6, similarity=0.6, rrf_k=60):
+    """
+    Merge the results of several search queries into one ranked, de-duplicated list.
+
+    Results are ranked by reciprocal rank fusion: a page scores 1 / (rrf_k + rank)
+    for every query that returned it, so pages found by several queries rise to the
+    top. The same page under a different URL spelling (see 'canonical_url') is
+    merged, and a result whose content overlaps an already kept one by at least
+    'similarity' (Jaccard similarity of word 3-grams) is dropped as a near-duplicate.
+
+    Args:
+        result_lists: One list of Tavily result dicts per query, in query order.
+        max_items: Maximum number of merged results returned.
+        similarity: Content overlap from which two results count as duplicates.
+        rrf_k: Rank fusion constant; larger values flatten the rank weighting.
+
+    Returns:
+        A tuple (results, duplicates): the merged results, best first, and the number
+        of results dropped as duplicates.
+    """
+
+    scores, first_seen, total = {}, {}, 0
+    for results in result_lists:
+        for rank, result in enumerate(results or [], start=1):
+            total += 1
+            key = canonical_url(result.get("url") or "") or f"#{id(result)}"
+            scores[key] = scores.get(key, 0.0) + 1 / (rrf_k + rank)
+            first_seen.setdefault(key, result)
+
+    merged, kept_shingles = [], []
+    for key in sorted(scores, key=scores.get, reverse=True):
+        result = first_seen[key]
+        grams = shingles(result.get("content"))
+        if grams and any(len(grams & other) / len(grams | other) >= similarity for other in kept_shingles):
+            continue
+        merged.append(result)
+        kept_shingles.append(grams)
+
+    return merged[:max_items], total - len(merged)
+
+
+def search_summary(queries, duplicates=0):
+    """
+    Header lines describing a multi-query search (none for a single query).
+    """
+
+    if not queries or len(queries) < 2:
+        return []
+    return [f"Queries searched: {len(queries)} ({'; '.join(queries)})",
+            f"Duplicates removed: {duplicates}"]
+
+
 def format_internet_results(results,
                             header="\n-- Internet Search Results --",
                             max_items=3,
-                            snippet_chars=600):
+                            snippet_chars=600,
+                            queries=None,
+                            duplicates=0):
     """
     Convert Tavily "search()" results into a single **text-only**, LLM-friendly string.
 
@@ -80,6 +172,9 @@ def format_internet_results(results,
         header:  Top-level heading for the formatted block.
         max_items: Maximum number of results to include (truncate beyond this).
         snippet_chars: Maximum length of the content snippet per result.
+        queries: The queries of a multi-query search (adds "Queries searched" and
+            "Duplicates removed" lines to the header).
+        duplicates: Number of results dropped as duplicates when merging the queries.
 
     Returns:
         A single formatted string suitable for an LLM observation. If no results are present,
@@ -97,6 +192,7 @@ def format_internet_results(results,
 
     # Start building the text block with a header and dynamic counts
     lines = [f"{header}\n",
+             *search_summary(queries, duplicates),
              f"Websites searched: {len(unique_domains)}",
              f"Results returned: {len(results)}",
              ""]
@@ -120,6 +216,50 @@ def format_internet_results(results,
     return "\n".join(lines).rstrip()
 
 
+def format_ranked_passages(passages, results, header="\n-- Internet Search Results --", queries=None, duplicates=0):
+    """
+    Convert ranked passages (see 'PassageRanker.select') into an LLM-friendly string.
+
+    Passages are grouped under the result they come from. Results are ordered by
+    their best passage, and passages keep their rank order. The layout matches
+    'format_internet_results', with "Passage:" lines in place of "Content:".
+
+    Args:
+        passages: (score, passage, result) tuples, best first.
+        results: Every result returned by the search (for the header counts).
+        header: Top-level heading for the formatted block.
+        queries: The queries of a multi-query search.
+        duplicates: Number of results dropped as duplicates when merging the queries.
+
+    Returns:
+        A single formatted string suitable for an LLM observation.
+    """
+
+    if not passages:
+        return f"{header}:\n\nNo search results found."
+
+    # Group by source result, in order of each result's best passage
+    grouped = {}
+    for _, passage, result in passages:
+        grouped.setdefault(id(result), (result, []))[1].append(passage)
+
+    unique_domains = {domain(r.get("url", "")) for r in results if r.get("url")}
+    lines = [f"{header}\n",
+             *search_summary(queries, duplicates),
+             f"Websites searched: {len(unique_domains)}",
+             f"Results returned: {len(results)}",
+             f"Passages kept: {len(passages)} (ranked by relevance to the query)",
+             ""]
+
+    for i, (result, kept) in enumerate(grouped.values(), start=1):
+        lines.append(f"Result {i}: {result.get('title') or '(no title)'}")
+        lines.append(f"URL: {result.get('url') or '(no url)'}")
+        lines.extend(f"Passage: {passage}" for passage in kept)
+        lines.append("")
+
+    return "\n".join(lines).rstrip()
+
+
 def clean_parentheses(s):
     """
     Remove unmatched closing parentheses at the end of the string.
@@ -145,15 +285,259 @@ def clean_parentheses(s):
     return s
 
 
+# Node types allowed in a 'calculator_eval' program
+_ARITHMETIC_BINOPS = {
+    ast.Add: lambda a, b: a + b,
+    ast.Sub: lambda a, b: a - b,
+    ast.Mult: lambda a, b: a * b,
+    ast.Div: lambda a, b: a / b,
+    ast.Pow: lambda a, b: a ** b,
+}
+_ARITHMETIC_UNARYOPS = {
+    ast.UAdd: lambda a: +a,
+    ast.USub: lambda a: -a,
+}
+
+
+def safe_eval_arithmetic(source, precision=28, max_exponent=1000):
+    """
+    Evaluate an arithmetic program with Decimal precision, allowing nothing else.
+
+    The program is parsed with 'ast' (like 'ast.literal_eval') and every node is
+    checked against a whitelist: numbers, '+ - * / **', parentheses, unary signs,
+    and named intermediate variables. Statements are separated by ';' or newlines,
+    e.g. "F = 321.5 / 256.1; N_adj = 15000000 * F; N_adj".
+
+    Args:
+        source (str): The program text.
+        precision (int): Significant digits for the Decimal context.
+        max_exponent (int): Largest absolute exponent allowed with '**'.
+
+    Returns:
+        Decimal: The value of the last statement (expression or assignment).
+
+    Raises:
+        ValueError: If the program uses anything outside the whitelist, references an
+            unknown variable, is nested too deeply to evaluate, or fails to evaluate.
+        ZeroDivisionError: If the program divides by zero.
+    """
+
+    source = source.replace("×", "*").replace("÷", "/").replace("^", "**")
+    try:
+        tree = ast.parse(source.strip(), mode="exec")
+    except SyntaxError as e:
+        raise ValueError(f"invalid syntax: {e.msg}") from None
+    except (RecursionError, MemoryError):
+        raise ValueError("expression is too long or too deeply nested") from None
+
+    if not tree.body:
+        raise ValueError("empty expression")
+
+    variables = {}
+
+    def evaluate(node):
+        if isinstance(node, ast.Constant) and type(node.value) in (int, float):
+            return Decimal(str(node.value))
+        if isinstance(node, ast.Name):
+            if node.id not in variables:
+                raise ValueError(f"unknown variable '{node.id}'")
+            return variables[node.id]
+        if isinstance(node, ast.BinOp) and type(node.op) in _ARITHMETIC_BINOPS:
+            left, right = evaluate(node.left), evaluate(node.right)
+            if isinstance(node.op, ast.Pow) and abs(right) > max_exponent:
+                raise ValueError(f"exponent {right} is too large")
+            return _ARITHMETIC_BINOPS[type(node.op)](left, right)
+        if isinstance(node, ast.UnaryOp) and type(node.op) in _ARITHMETIC_UNARYOPS:
+            return _ARITHMETIC_UNARYOPS[type(node.op)](evaluate(node.operand))
+        raise ValueError(f"'{ast.unparse(node)}' is not allowed")
+
+    with localcontext() as context:
+        context.prec = precision
+        context.traps[DivisionByZero] = True
+        result = None
+        try:
+            for statement in tree.body:
+                if isinstance(statement, ast.Assign) and len(statement.targets) == 1 \
+                        and isinstance(statement.targets[0], ast.Name):
+                    result = variables[statement.targets[0].id] = evaluate(statement.value)
+                elif isinstance(statement, ast.Expr):
+                    result = evaluate(statement.value)
+                else:
+                    raise ValueError(f"'{ast.unparse(statement)}' is not allowed")
+        except DivisionByZero:
+            raise ZeroDivisionError("division by zero") from None
+        except (InvalidOperation, ArithmeticError) as e:
+            raise ValueError(f"invalid operation: {e!r}") from None
+        except RecursionError:
+            # 'evaluate' recurses once per operator of a left-deep chain such as "1+1+...+1"
+            raise ValueError("expression is too long or too deeply nested") from None
+
+    return result
+
+
+def calculator_operands(value):
+    """
+    Split a parsed calculator Action Input into its (a, b) operands.
+
+    Accepted shapes:
+        (a, b)                        -> two scalars, or scalars/lists to broadcast
+        [(a1, b1), (a2, b2), ...]     -> a list of pairs, split into two columns
+        [x1, x2, x3, ...]             -> a flat series (b is None), e.g. to sum
+
+    Args:
+        value (tuple | list): The literal evaluated from the Action Input.
+
+    Returns:
+        tuple: The (a, b) operands.
+
+    Raises:
+        ValueError: If the value does not match any accepted shape.
+    """
+
+    if not isinstance(value, (list, tuple)) or not value:
+        raise ValueError("calculator input must be a tuple or list")
+
+    if isinstance(value, list) and all(isinstance(pair, (list, tuple)) for pair in value):
+        if any(len(pair) != 2 for pair in value):
+            raise ValueError("every pair must hold exactly two numbers")
+        a, b = zip(*value)
+        return list(a), list(b)
+
+    if len(value) != 2:
+        if any(isinstance(x, (list, tuple)) for x in value):
+            raise ValueError("expected two operands")
+        return list(value), None
+
+    a, b = value
+    return a, b
+
+
+def parse_search_queries(action_input, max_queries=5):
+    """
+    Turn an 'internet_search' input into its list of queries.
+
+    The input is either one plain query or a list of queries, given as a list or as
+    its literal text (e.g. '["CPI-U July 2025", "BLS CPI release July 2025"]').
+    Empty and repeated queries are dropped.
+
+    Args:
+        action_input (str | list[str]): The raw input.
+        max_queries (int): Maximum number of queries kept.
+
+    Returns:
+        list[str]: At least one query.
+    """
+
+    queries = action_input
+    if isinstance(queries, str):
+        text = queries.strip()
+        queries = [text]
+        if text.startswith("[") and text.endswith("]"):
+            try:
+                value = ast.literal_eval(text)
+            except (ValueError, SyntaxError):
+                value = None
+            if isinstance(value, (list, tuple)) and value:
+                queries = value
+
+    unique = {}
+    for query in queries:
+        query = str(query).strip().strip("\"'").strip()
+        if query and " ".join(query.lower().split()) not in unique:
+            unique[" ".join(query.lower().split())] = query
+    return list(unique.values())[:max_queries] or [str(action_input)]
+
+
+def parse_operands(text):
+    """
+    Parse the Action Input of a two-number calculator tool into its 'a' and 'b' arguments.
+
+    Excess parentheses are cleaned up, the input is evaluated as a Python literal
+    and split into its operands (see 'calculator_operands').
+
+    Raises:
+        ValueError, SyntaxError: If the input is not a valid Python literal.
+    """
+
+    a, b = calculator_operands(ast.literal_eval(clean_parentheses(text)))
+    return {"a": a, "b": b}
+
+
+def parse_action_input(action, action_input):
+    """
+    Convert the raw 'Action Input:' string into the keyword arguments of a tool.
+
+    Each tool declares how its text input is parsed in the tool registry: the
+    two-number calculators take a Python literal, text tools ('llm_knowledge',
+    'internet_search', 'calculator_eval') receive the raw string. The result is
+    validated against the tool's parameter schema.
+
+    Args:
+        action (str): The tool name.
+        action_input (str): The raw text after 'Action Input:'.
+
+    Returns:
+        dict: The keyword arguments for the tool.
+
+    Raises:
+        UnknownToolError: If 'action' is not a registered tool.
+        ValueError, SyntaxError: If the input does not parse or match the schema.
+    """
+
+    return registry.parse(action, action_input)
+
+
+# An "Action:" or "Action Input:" line with a non-empty value. Shared by 'extract_actions',
+# 'StreamingActionParser' and the agent's step events, so every reader pairs the same lines.
+ACTION_LINE = re.compile(r"^[ \t]*(Action|Action Input):[ \t]*(\S.*?)[ \t]*$", re.MULTILINE)
+
+
+def extract_actions(text):
+    """
+    Parse an LLM response for every tool action and its input.
+
+    A turn may contain several independent 'Action:' / 'Action Input:' pairs.
+    Each 'Action:' line is paired with the next 'Action Input:' line that
+    follows it, in order.
+
+    Args:
+        text (str): The LLM response text containing tool directives.
+
+    Returns:
+        list[tuple[str, dict]]: The (action, action_input) pairs in the order they
+            appear. An action that is not a registered tool is kept with empty
+            arguments, so the agent answers it with the list of valid tools while
+            its siblings still run. Returns [] if no complete pair is present or if
+            any input fails to parse, since the whole turn must then be re-prompted.
+    """
+
+    actions = []
+    pending_action = None
+
+    # Walk the "Action:" and "Action Input:" lines in order
+    for kind, value in ACTION_LINE.findall(text):
+        if kind == "Action":
+            pending_action = value
+        elif pending_action is not None and pending_action not in registry:
+            actions.append((pending_action, {}))
+            pending_action = None
+        elif pending_action is not None:
+            try:
+                actions.append((pending_action, parse_action_input(pending_action, value)))
+            except Exception as e:
+                log(f"Failed to parse action_input: {value} — {e}")
+                return []
+            pending_action = None
+
+    return actions
+
+
 def extract_action_and_action_input(text):
     """
     Parse an LLM response for a tool action and its input.
 
-    This function searches the given text for lines starting with
-    'Action:' and 'Action Input:'. If both are found, it extracts
-    the tool name (action) and the argument string. For calculator
-    tools (all except 'llm_knowledge'), it will clean up any excess
-    parentheses and evaluate the argument as a Python literal.
+    Convenience wrapper around 'extract_actions' for callers that only handle a
+    single action per turn.
 
     Args:
         text (str): The LLM response text containing tool directives.
@@ -161,33 +545,108 @@ def extract_action_and_action_input(text):
     Returns:
         tuple[str, Any] or (None, None):
             - action (str): The tool name to call.
-            - action_input (Any): The parsed argument(s) for the tool.
-              For calculator tools, this will be a Python object (e.g.,
-              tuple or list). For 'llm_knowledge', it will be a raw string.
+            - action_input (dict): The keyword arguments for the tool, e.g.
+              {"a": 5, "b": 5} for the calculators or {"prompt": "..."} for
+              'llm_knowledge'.
             If the required directives are missing or parsing fails,
             returns (None, None) to indicate an invalid format.
     """
 
-    # Search for "Action:" and "Action Input:" lines
-    action_match = re.search(r"Action: (.*)", text)
-    action_input_match = re.search(r"Action Input: (.*)", text)
+    actions = extract_actions(text)
+    if actions:
+        return actions[0]
 
-    # Proceed only if both are present
-    if action_match and action_input_match:
-        action = action_match.group(1).strip()
-        action_input = action_input_match.group(1).strip()
+    # Missing either "Action:" or "Action Input:" invalid format
+    return None, None
 
-        # For calculator tools, parse Python literal after cleaning parentheses
-        if action not in {"llm_knowledge", "internet_search"}:
-            try:
-                raw = clean_parentheses(action_input)
-                action_input = ast.literal_eval(raw)
-            except Exception as e:
-                print(f"Failed to parse action_input: {action_input} — {e}")
-                return None, None
 
-        # Return the tool name and its input argument
-        return action, action_input
+class StreamingActionParser:
+    """
+    Incrementally parse a streamed LLM response for Action / Action Input pairs.
+
+    Text deltas are fed in as they arrive. Each line is inspected as soon as its
+    trailing newline shows up, so the caller can dispatch each tool the moment its
+    pair is complete (or surface a final answer) without waiting for the model to
+    finish generating.
+
+    States:
+        "thought":      no control line of interest seen yet.
+        "action":       an 'Action:' line was seen, waiting for 'Action Input:'.
+        "ready":        at least one complete pair is in 'actions'; another may follow.
+        "done":         a non-action line followed the last pair, the turn is over.
+        "final_answer": a 'Final Answer:' line was seen.
+
+    Once "done", 'text' is cut right after the last 'Action Input:' line so it can be
+    handed to 'extract_actions' and stored in the chat history.
+    """
 
-    # Missing either "Action:" or "Action Input:" invalid format
-    return None, None
\ No newline at end of file
+    def __init__(self):
+        self.text = ""
+        self.state = "thought"
+        self.actions = []     # raw (action, action_input) strings, in order
+        self._pending = None  # action name waiting for its 'Action Input:'
+        self._cut = 0         # offset right after the last 'Action Input:' line
+        self._line_start = 0  # offset of the current (unfinished) line in 'text'
+
+    def feed(self, delta):
+        """
+        Append a streamed text delta and advance the state machine.
+
+        Args:
+            delta (str): The newly generated text (may be empty or None).
+
+        Returns:
+            str: The parser state after consuming 'delta'.
+        """
+
+        if self.state == "done" or not delta:
+            return self.state
+
+        self.text += delta
+        while self.state != "done":
+            newline = self.text.find("\n", self._line_start)
+            if newline == -1:
+                break
+            self._on_line(self.text[self._line_start:newline].strip(), newline)
+            self._line_start = newline + 1
+
+        if self.state == "done":
+            # Drop anything generated after the last Action Input line
+            self.text = self.text[:self._cut]
+        return self.state
+
+    def finish(self):
+        """
+        Flush the trailing partial line once the stream has ended.
+
+        Returns:
+            str: The final parser state.
+        """
+
+        if self.state != "done" and self._line_start < len(self.text):
+            self._on_line(self.text[self._line_start:].strip(), len(self.text))
+            self._line_start = len(self.text)
+
+        if self.actions and self.state in {"ready", "action"}:
+            self.state = "done"
+            self.text = self.text[:self._cut]
+        return self.state
+
+    def _on_line(self, line, end):
+        # Once a final answer starts, everything after it belongs to the answer
+        if self.state == "final_answer":
+            return
+        match = ACTION_LINE.match(line)
+        if line.startswith("Final Answer:"):
+            self.state = "final_answer"
+        elif match and match.group(1) == "Action Input" and self._pending is not None:
+            self.actions.append((self._pending, match.group(2)))
+            self._pending = None
+            self._cut = end
+            self.state = "ready"
+        elif match and match.group(1) == "Action":
+            self._pending = match.group(2)
+            self.state = "action"
+        elif line and self.state == "ready":
+            # Anything but another Action after a complete pair ends the turn
+            self.state = "done"